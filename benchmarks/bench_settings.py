@@ -0,0 +1,22 @@
+"""
+Настройки yanews для нагрузочного теста.
+
+Как на проде: без DEBUG и с прогретыми шаблонами. База своя, чтобы
+наполнение не трогало базу разработки. Асинхронные лента и новость
+включаются переменной окружения NEWS_ASYNC_VIEWS=1.
+"""
+import os
+from pathlib import Path
+
+from yanews.settings import *  # noqa: F401,F403
+from yanews.settings import DATABASES
+
+DEBUG = False
+
+TEMPLATES_WARMUP = True
+
+NEWS_ASYNC_VIEWS = os.environ.get('NEWS_ASYNC_VIEWS') == '1'
+
+DATABASES['default']['NAME'] = (
+    Path(__file__).resolve().parent / 'bench.sqlite3'
+)
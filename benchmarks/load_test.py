@@ -0,0 +1,205 @@
+"""
+Нагрузочный тест ленты и страницы новости: ASGI против WSGI.
+
+Поднимает yanews.asgi под uvicorn с асинхронными представлениями
+(NEWS_ASYNC_VIEWS) и yanews.wsgi под gunicorn с синхронными, нагружает
+каждый сервер 1, 50 и 500 одновременными клиентами и печатает задержки
+p50 и p99 и число запросов в секунду. Клиент — asyncio без сторонних
+библиотек, каждый запрос на новом соединении, как у браузера без
+keep-alive: так серверы сравниваются в одинаковых условиях.
+
+    pip install -r benchmarks/requirements.txt
+    python benchmarks/load_test.py --prepare
+"""
+import argparse
+import asyncio
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+PROJECT_DIR = BENCH_DIR.parent / 'ya_news'
+HOST = '127.0.0.1'
+SERVERS = {
+    'asgi': (
+        'uvicorn', 'yanews.asgi:application',
+        '--host', HOST, '--port', '{port}', '--workers', '{workers}',
+        '--log-level', 'warning', '--no-access-log',
+    ),
+    'wsgi': (
+        'gunicorn', 'yanews.wsgi:application',
+        '--bind', f'{HOST}:{{port}}', '--workers', '{workers}',
+        '--worker-class', 'gthread', '--threads', '{threads}',
+        '--log-level', 'warning',
+    ),
+}
+SEED_OPTIONS = (
+    '--users=50', '--news=1000', '--comments-per-news=20', '--seed=1'
+)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument(
+        '--servers', nargs='+', choices=SERVERS, default=list(SERVERS),
+    )
+    parser.add_argument(
+        '--clients', nargs='+', type=int, default=[1, 50, 500],
+        help='Число одновременных клиентов для каждого прогона.',
+    )
+    parser.add_argument(
+        '--duration', type=float, default=10.0,
+        help='Длительность одного прогона, с.',
+    )
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument(
+        '--threads', type=int, default=8,
+        help='Потоков на процесс gunicorn.',
+    )
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument(
+        '--news-pages', type=int, default=100,
+        help='Сколько разных страниц новостей обходят клиенты.',
+    )
+    parser.add_argument(
+        '--prepare', action='store_true',
+        help='Создать базу теста заново и наполнить её через seed_news.',
+    )
+    return parser.parse_args()
+
+
+def server_env(name):
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(
+        filter(None, (str(PROJECT_DIR), str(BENCH_DIR), env.get('PYTHONPATH')))
+    )
+    env['DJANGO_SETTINGS_MODULE'] = 'bench_settings'
+    env['NEWS_ASYNC_VIEWS'] = '1' if name == 'asgi' else '0'
+    return env
+
+
+def prepare():
+    """Пересоздаёт базу теста: миграции и синтетические данные."""
+    for suffix in ('', '-wal', '-shm'):
+        (BENCH_DIR / f'bench.sqlite3{suffix}').unlink(missing_ok=True)
+    for command in (('migrate',), ('seed_news', *SEED_OPTIONS)):
+        subprocess.run(
+            (sys.executable, 'manage.py', *command, '--verbosity=0'),
+            cwd=PROJECT_DIR, env=server_env('wsgi'), check=True,
+        )
+
+
+def start_server(name, args):
+    command = [
+        part.format(port=args.port, workers=args.workers,
+                    threads=args.threads)
+        for part in SERVERS[name]
+    ]
+    return subprocess.Popen(
+        (sys.executable, '-m', *command),
+        cwd=PROJECT_DIR, env=server_env(name),
+    )
+
+
+def wait_for_server(port, timeout=30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection((HOST, port), timeout=1):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f'Сервер не поднялся на порту {port}.')
+
+
+async def fetch(port, path):
+    """GET на новом соединении; возвращает код ответа."""
+    reader, writer = await asyncio.open_connection(HOST, port)
+    try:
+        writer.write(
+            f'GET {path} HTTP/1.1\r\nHost: {HOST}\r\n'
+            f'Connection: close\r\n\r\n'.encode()
+        )
+        await writer.drain()
+        status_line = await reader.readline()
+        await reader.read()
+    finally:
+        writer.close()
+        await writer.wait_closed()
+    return int(status_line.split()[1])
+
+
+async def load(port, paths, clients, duration):
+    """
+    Клиенты по кругу запрашивают paths до истечения duration.
+
+    Возвращает задержки успешных запросов, число ошибок и время прогона.
+    """
+    latencies = []
+    errors = 0
+    deadline = time.perf_counter() + duration
+
+    async def client(offset):
+        nonlocal errors
+        request = offset
+        while time.perf_counter() < deadline:
+            path = paths[request % len(paths)]
+            request += 1
+            started = time.perf_counter()
+            try:
+                status = await fetch(port, path)
+            except (OSError, IndexError, ValueError):
+                status = None
+            if status == 200:
+                latencies.append(time.perf_counter() - started)
+            else:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client(offset) for offset in range(clients)))
+    return latencies, errors, time.perf_counter() - started
+
+
+def report(name, clients, latencies, errors, elapsed):
+    if len(latencies) < 2:
+        print(f'{name:>6} {clients:>8} {len(latencies):>9} {errors:>7}'
+              '       —        —        —')
+        return
+    percentiles = statistics.quantiles(latencies, n=100)
+    print(
+        f'{name:>6} {clients:>8} {len(latencies):>9} {errors:>7} '
+        f'{len(latencies) / elapsed:>7.0f} '
+        f'{percentiles[49] * 1000:>8.1f} {percentiles[98] * 1000:>8.1f}'
+    )
+
+
+def main():
+    args = parse_args()
+    if args.prepare:
+        prepare()
+    paths = ['/'] + [
+        f'/news/{news_id}/' for news_id in range(1, args.news_pages + 1)
+    ]
+    print(f'{"сервер":>6} {"клиенты":>8} {"запросов":>9} {"ошибок":>7} '
+          f'{"RPS":>7} {"p50, мс":>8} {"p99, мс":>8}')
+    for name in args.servers:
+        server = start_server(name, args)
+        try:
+            wait_for_server(args.port)
+            # Прогрев: соединения с БД, кеш страниц комментариев.
+            asyncio.run(load(args.port, paths, 10, 2.0))
+            for clients in args.clients:
+                report(name, clients, *asyncio.run(
+                    load(args.port, paths, clients, args.duration)
+                ))
+        finally:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,8 @@
+"""
+Общий код проектов yanews и yanote.
+
+Учёт запросов к БД, кеш пользователя запроса, хеширование паролей,
+асинхронный вход и прогрев шаблонов. Каталог репозитория, в котором
+лежит пакет, добавляют в sys.path manage.py, wsgi.py и asgi.py
+проектов, а в тестах — настройка pythonpath в pytest.ini.
+"""
@@ -0,0 +1,93 @@
+"""
+Пользователь запроса из кеша.
+
+AuthenticationMiddleware на каждый запрос загружает пользователя из БД.
+CachedModelBackend сначала ищет его в кеше под ключом с версией
+пользователя. Версию сбрасывают сохранение и удаление пользователя,
+в том числе смена пароля, и выход из системы. Вместе с сессиями
+cached_db страница авторизованного пользователя обходится без запросов
+к БД на сессию и пользователя. Включается настройкой AUTH_CACHE.
+
+Сброс версии виден другим процессам, только если кеш общий: с LocMemCache
+смена пароля в одном процессе не выгонит пользователя из остальных.
+Поэтому проверка check_shared_cache не даёт запуститься с таким кешем.
+"""
+import time
+
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.signals import user_logged_out
+from django.core import checks
+from django.core.cache import DEFAULT_CACHE_ALIAS, cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+USER_VERSION_KEY = 'auth:user:{user_id}:version'
+USER_KEY = 'auth:user:{user_id}:{version}'
+CACHED_BACKEND = 'common.authcache.CachedModelBackend'
+CACHED_SESSIONS = 'django.contrib.sessions.backends.cached_db'
+
+
+def user_key(user_id):
+    """Ключ пользователя с текущей версией его данных."""
+    version_key = USER_VERSION_KEY.format(user_id=user_id)
+    version = cache.get(version_key)
+    if version is None:
+        cache.add(version_key, time.time_ns(), timeout=None)
+        version = cache.get(version_key)
+    return USER_KEY.format(user_id=user_id, version=version)
+
+
+def bump_user_version(user_id):
+    """Делает недействительной закешированную копию пользователя."""
+    version_key = USER_VERSION_KEY.format(user_id=user_id)
+    try:
+        cache.incr(version_key)
+    except ValueError:
+        cache.set(version_key, time.time_ns(), timeout=None)
+
+
+class CachedModelBackend(ModelBackend):
+    """ModelBackend, который берёт пользователя сессии из кеша."""
+
+    def get_user(self, user_id):
+        key = user_key(user_id)
+        user = cache.get(key)
+        if user is None:
+            user = super().get_user(user_id)
+            if user is not None:
+                cache.set(key, user, settings.AUTH_CACHE_TIMEOUT)
+        return user
+
+
+@checks.register(checks.Tags.caches)
+def check_shared_cache(app_configs, **kwargs):
+    """Кеш сессий и пользователей должен быть общим для всех процессов."""
+    if (
+        CACHED_BACKEND not in settings.AUTHENTICATION_BACKENDS
+        and settings.SESSION_ENGINE != CACHED_SESSIONS
+    ):
+        return []
+    if not isinstance(caches[DEFAULT_CACHE_ALIAS], LocMemCache):
+        return []
+    return [checks.Error(
+        'Кеш сессий и пользователей (AUTH_CACHE) не работает с LocMemCache.',
+        hint=(
+            'У каждого процесса свой LocMemCache: выход и смена пароля '
+            'не дойдут до остальных. Укажите в CACHES общий кеш, '
+            'например Redis или Memcached.'
+        ),
+        id='common.E001',
+    )]
+
+
+@receiver((post_save, post_delete), sender=settings.AUTH_USER_MODEL)
+def user_changed(sender, instance, **kwargs):
+    bump_user_version(instance.pk)
+
+
+@receiver(user_logged_out)
+def user_logged_out_changed(sender, request, user, **kwargs):
+    if user is not None:
+        bump_user_version(user.pk)
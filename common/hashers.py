@@ -0,0 +1,34 @@
+"""
+Хешеры паролей со стоимостью из настройки PASSWORD_HASHING_COST.
+
+Алгоритм новых паролей выбирает PASSWORD_HASHING. Хеш, посчитанный
+другим алгоритмом или с другой стоимостью, Django сам пересчитывает
+при следующем успешном входе: check_password сравнивает параметры
+хеша с текущими через must_update.
+"""
+from django.conf import settings
+from django.contrib.auth import hashers
+
+
+def cost(algorithm, name):
+    """Параметр стоимости, который читается из настроек при каждом вызове."""
+    return property(
+        lambda self: settings.PASSWORD_HASHING_COST[algorithm][name]
+    )
+
+
+class PBKDF2PasswordHasher(hashers.PBKDF2PasswordHasher):
+    iterations = cost('pbkdf2', 'iterations')
+
+
+class ScryptPasswordHasher(hashers.ScryptPasswordHasher):
+    work_factor = cost('scrypt', 'work_factor')
+    block_size = cost('scrypt', 'block_size')
+    parallelism = cost('scrypt', 'parallelism')
+
+
+class Argon2PasswordHasher(hashers.Argon2PasswordHasher):
+    """Требует пакета argon2-cffi."""
+    time_cost = cost('argon2', 'time_cost')
+    memory_cost = cost('argon2', 'memory_cost')
+    parallelism = cost('argon2', 'parallelism')
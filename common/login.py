@@ -0,0 +1,81 @@
+"""
+Вход с проверкой пароля в отдельном пуле потоков.
+
+Хеширование пароля занимает десятки миллисекунд процессора. Под ASGI
+синхронные представления выполняются в общем потоке, и волна входов
+задерживает все остальные синхронные запросы. AsyncLoginView проверяет
+форму входа в пуле из PASSWORD_HASHING_THREADS потоков, а цикл событий
+тем временем обслуживает чтение. Включается настройкой ASYNC_LOGIN.
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import views as auth_views
+from django.db import close_old_connections
+from django.http import HttpResponseRedirect
+from django.utils.decorators import method_decorator
+from django.views import generic
+from django.views.decorators.cache import never_cache
+from django.views.decorators.csrf import csrf_protect
+from django.views.decorators.debug import sensitive_post_parameters
+
+
+@lru_cache
+def hashing_executor():
+    return ThreadPoolExecutor(
+        max_workers=settings.PASSWORD_HASHING_THREADS,
+        thread_name_prefix='password-hashing',
+    )
+
+
+def run_and_close(func):
+    """
+    Выполняет func в потоке пула.
+
+    У каждого потока пула своё соединение с БД, и закрываем его
+    по CONN_MAX_AGE так же, как после обычного запроса.
+    """
+    try:
+        return func()
+    finally:
+        close_old_connections()
+
+
+async def run_hashing(func):
+    """Выполняет func с хешированием паролей в пуле потоков."""
+    return await asyncio.get_running_loop().run_in_executor(
+        hashing_executor(), run_and_close, func
+    )
+
+
+@method_decorator(
+    (sensitive_post_parameters(), csrf_protect, never_cache), name='dispatch'
+)
+class AsyncLoginView(auth_views.LoginView):
+    """LoginView, который не держит общий поток на время проверки пароля."""
+    http_method_names = ['get', 'post']
+
+    async def dispatch(self, request, *args, **kwargs):
+        """
+        Как LoginView.dispatch, но асинхронный.
+
+        Декораторы родителя обернули синхронный dispatch и не умеют
+        ждать корутину, поэтому они повторены на этом классе.
+        """
+        if self.redirect_authenticated_user and (
+            await request.auser()
+        ).is_authenticated:
+            return HttpResponseRedirect(self.get_success_url())
+        return await generic.View.dispatch(self, request, *args, **kwargs)
+
+    async def get(self, request, *args, **kwargs):
+        return await sync_to_async(super().get)(request, *args, **kwargs)
+
+    async def post(self, request, *args, **kwargs):
+        form = self.get_form()
+        if await run_hashing(form.is_valid):
+            return await sync_to_async(self.form_valid)(form)
+        return self.form_invalid(form)
@@ -0,0 +1,192 @@
+"""
+Учёт запросов к БД на каждый HTTP-запрос.
+
+QueryBudgetMiddleware считает запросы представления, время в БД, повторы
+одинаковых запросов и время рендера шаблона. Итог уходит в заголовок
+Server-Timing и в лог, а бюджеты из settings.QUERY_BUDGETS проверяются
+в тестах через assert_query_budget.
+"""
+import hashlib
+import json
+import logging
+import time
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+
+from asgiref.sync import (
+    iscoroutinefunction, markcoroutinefunction, sync_to_async
+)
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+
+def fingerprint(sql):
+    """Отпечаток запроса: SQL с плейсхолдерами вместо параметров."""
+    return hashlib.sha1(sql.encode()).hexdigest()[:12]
+
+
+class QueryReport:
+    """Статистика запросов к БД за время обработки одного HTTP-запроса."""
+
+    def __init__(self):
+        self.view_name = None
+        self.auth_queries = 0
+        self.queries = 0
+        self.db_time = 0.0
+        self.render_time = None
+        self.total_time = None
+        self.statements = Counter()
+        self.samples = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - started
+            self.queries += 1
+            key = fingerprint(sql)
+            self.statements[key] += 1
+            self.samples.setdefault(key, sql)
+
+    @contextmanager
+    def capture(self):
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(self))
+            yield self
+
+    @property
+    def duplicates(self):
+        """Отпечатки запросов, выполненных больше одного раза."""
+        return {
+            key: count for key, count in self.statements.items() if count > 1
+        }
+
+    @property
+    def budget(self):
+        return getattr(settings, 'QUERY_BUDGETS', {}).get(self.view_name)
+
+    def as_dict(self):
+        return {
+            'view': self.view_name,
+            'auth_queries': self.auth_queries,
+            'queries': self.queries,
+            'budget': self.budget,
+            'db_ms': round(self.db_time * 1000, 2),
+            'render_ms': (
+                None if self.render_time is None
+                else round(self.render_time * 1000, 2)
+            ),
+            'total_ms': round(self.total_time * 1000, 2),
+            'duplicates': self.duplicates,
+        }
+
+    def server_timing(self):
+        metrics = [
+            f'db;dur={self.db_time * 1000:.2f};desc="{self.queries} queries"'
+        ]
+        if self.render_time is not None:
+            metrics.append(f'tpl;dur={self.render_time * 1000:.2f}')
+        metrics.append(f'total;dur={self.total_time * 1000:.2f}')
+        return ', '.join(metrics)
+
+
+class QueryBudgetMiddleware:
+    """
+    Собирает QueryReport для каждого запроса.
+
+    Ставится сразу после AuthenticationMiddleware: загрузка сессии и
+    пользователя учитывается отдельно (auth_queries), а в бюджет
+    представления идут только его собственные запросы.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        started = time.perf_counter()
+        report = self.start(request)
+        with report.capture():
+            response = self.get_response(request)
+        return self.finish(request, response, report, started)
+
+    async def __acall__(self, request):
+        """
+        Асинхронный вариант: запросы к БД идут в потоке sync_to_async.
+
+        Соединения у каждого потока свои, поэтому перехватчик ставится
+        и снимается в том же потоке, где выполняются запросы запроса.
+        """
+        started = time.perf_counter()
+        report = await sync_to_async(self.start)(request)
+        stack = await sync_to_async(self.begin_capture)(report)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(stack.close)()
+        return self.finish(request, response, report, started)
+
+    def start(self, request):
+        report = QueryReport()
+        request.query_report = report
+        with report.capture():
+            request.user.is_authenticated
+        report.auth_queries, report.queries = report.queries, 0
+        report.statements.clear()
+        return report
+
+    def begin_capture(self, report):
+        stack = ExitStack()
+        stack.enter_context(report.capture())
+        return stack
+
+    def finish(self, request, response, report, started):
+        report.total_time = time.perf_counter() - started
+        if request.resolver_match is not None:
+            report.view_name = request.resolver_match.view_name
+        response['Server-Timing'] = report.server_timing()
+        response.query_report = report
+        logger.info(json.dumps(report.as_dict(), ensure_ascii=False))
+        if report.budget is not None and report.queries > report.budget:
+            logger.warning(
+                'Бюджет запросов %s превышен: %s > %s',
+                report.view_name, report.queries, report.budget,
+            )
+        return response
+
+    def process_template_response(self, request, response):
+        started = time.perf_counter()
+
+        def rendered(response):
+            request.query_report.render_time = time.perf_counter() - started
+
+        response.add_post_render_callback(rendered)
+        return response
+
+
+def assert_query_budget(response):
+    """Проверяет, что ответ уложился в бюджет запросов своего URL."""
+    report = response.query_report
+    if report.budget is None:
+        raise AssertionError(
+            f'Для {report.view_name} не задан бюджет в QUERY_BUDGETS.'
+        )
+    if report.queries > report.budget:
+        repeated = '\n'.join(
+            f'{count} x {report.samples[key]}'
+            for key, count in report.duplicates.items()
+        )
+        raise AssertionError(
+            f'{report.view_name}: {report.queries} запросов при бюджете '
+            f'{report.budget}.\n{repeated}'
+        )
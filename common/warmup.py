@@ -0,0 +1,21 @@
+"""Прогрев кеша шаблонов при запуске приложения."""
+from pathlib import Path
+
+from django.template import engines
+
+
+def warm_templates():
+    """
+    Загружает в кеш загрузчика все шаблоны из каталогов DIRS.
+
+    Шаблоны приложений не трогаем: их загрузит первый запрос.
+    Возвращает имена загруженных шаблонов.
+    """
+    names = []
+    for engine in engines.all():
+        for directory in map(Path, engine.dirs):
+            for path in sorted(directory.rglob('*.html')):
+                name = path.relative_to(directory).as_posix()
+                engine.get_template(name)
+                names.append(name)
+    return names
@@ -1,15 +1,76 @@
+import re
+
+from django.conf import settings
 from django.contrib import admin
+from django.forms.models import BaseInlineFormSet
+from django.urls import reverse
+from django.utils.html import format_html
 
 from .models import Comment, News
 
 
-class CommentInline(admin.StackedInline):
+class LatestCommentsFormSet(BaseInlineFormSet):
+    """
+    Только последние комментарии новости.
+
+    У популярной новости тысячи комментариев, и форма на каждый
+    не даёт открыть страницу. Остальные правятся в списке комментариев.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        queryset = self.queryset.order_by('-created', '-id')
+        if self.is_bound:
+            # Пока форма была открыта, могли прийти новые комментарии
+            # и сдвинуть последние N: сохраняем те, что были на странице.
+            self.queryset = queryset.filter(pk__in=self.posted_ids())
+        else:
+            self.queryset = queryset[:settings.COMMENTS_ADMIN_INLINE_LIMIT]
+
+    def posted_ids(self):
+        """Ключи комментариев из полей <prefix>-N-id отправленной формы."""
+        id_field = re.compile(rf'{re.escape(self.prefix)}-\d+-id')
+        return [
+            value for key, value in self.data.items()
+            if id_field.fullmatch(key) and value.isdecimal()
+        ]
+
+
+class CommentInline(admin.TabularInline):
     model = Comment
+    formset = LatestCommentsFormSet
     extra = 0
+    raw_id_fields = ('author',)
+    fields = ('author', 'text', 'created')
+    readonly_fields = ('created',)
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('author')
 
 
 @admin.register(News)
 class NewsAdmin(admin.ModelAdmin):
+    list_display = ('title', 'date', 'comments_count', 'all_comments')
+    # Фильтр и сортировка идут по индексу (date, id).
+    list_filter = ('date',)
+    ordering = ('-date', '-id')
+    show_full_result_count = False
     inlines = [
         CommentInline,
     ]
+
+    @admin.display(description='Все комментарии')
+    def all_comments(self, news):
+        return format_html(
+            '<a href="{}?news__id__exact={}">Открыть</a>',
+            reverse('admin:news_comment_changelist'), news.pk,
+        )
+
+
+@admin.register(Comment)
+class CommentAdmin(admin.ModelAdmin):
+    list_display = ('__str__', 'news', 'author', 'created')
+    list_select_related = ('news', 'author')
+    raw_id_fields = ('news', 'author')
+    ordering = ('-id',)
+    show_full_result_count = False
@@ -0,0 +1,123 @@
+"""
+Асинхронные версии страниц чтения для запуска под ASGI.
+
+Данные читаются асинхронным ORM, шаблон Django рендерит уже сам в потоке,
+как любой TemplateResponse из асинхронного представления. Включаются
+настройкой NEWS_ASYNC_VIEWS.
+"""
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.shortcuts import aget_object_or_404
+from django.template.response import TemplateResponse
+from django.utils.cache import get_conditional_response, quote_etag
+from django.views import generic
+
+from yanews.replicas import reading_replica
+
+from .cache import aget_feed_version, aget_news_version, comments_page_key
+from .forms import CommentForm
+from .models import News
+from .pagination import KeysetPaginator
+from .views import (
+    CommentsPageMixin, NewsComment, NewsDetail, NewsList, make_etag,
+    pending_comments, render_comments_page, with_pending
+)
+
+
+def not_modified(request, etag):
+    """Ответ 304 или 412, если клиент уже держит актуальную страницу."""
+    if etag is None:
+        return None
+    return get_conditional_response(request, etag=quote_etag(etag))
+
+
+def with_etag(response, etag):
+    """Ставит ETag, если он есть: при чтении с реплики его не выдаём."""
+    if etag is not None:
+        response.headers['ETag'] = quote_etag(etag)
+    return response
+
+
+class AsyncNewsList(generic.View):
+    """Список новостей."""
+    replica_reads = True
+
+    async def get(self, request, *args, **kwargs):
+        user = await request.auser()
+        etag = None
+        if not reading_replica():
+            etag = make_etag(request, await aget_feed_version(), user=user)
+        response = not_modified(request, etag)
+        if response is not None:
+            return response
+        page = KeysetPaginator(
+            News.objects.defer('text'),
+            NewsList.ordering,
+            settings.NEWS_COUNT_ON_HOME_PAGE,
+        ).get_page(request.GET.get('cursor'))
+        await page.aload()
+        response = TemplateResponse(request, NewsList.template_name, {
+            'object_list': page.object_list,
+            'page_obj': page,
+        })
+        return with_etag(response, etag)
+
+
+class AsyncNewsDetail(generic.View):
+    """Новость с комментариями."""
+
+    async def get_comments_page(self, news, cursor, version):
+        key = comments_page_key(news.pk, cursor, version)
+        comments_page = await cache.aget(key)
+        if comments_page is None:
+            page = KeysetPaginator(
+                news.comment_set.select_related('author'),
+                CommentsPageMixin.comments_ordering,
+                settings.COMMENTS_COUNT_ON_NEWS_PAGE,
+            ).get_page(cursor)
+            await page.aload()
+            comments_page = render_comments_page(page)
+            if not reading_replica():
+                await cache.aset(
+                    key, comments_page, settings.COMMENTS_CACHE_TIMEOUT
+                )
+        return comments_page
+
+    async def get(self, request, pk, *args, **kwargs):
+        user = await request.auser()
+        version = await aget_news_version(pk)
+        pending = await sync_to_async(pending_comments)(pk, user)
+        etag = None
+        if not reading_replica():
+            etag = make_etag(
+                request, with_pending(version, pending), user=user
+            )
+        response = not_modified(request, etag)
+        if response is not None:
+            return response
+        news = await aget_object_or_404(News, pk=pk)
+        context = {
+            'object': news,
+            'news': news,
+            'comments_page': await self.get_comments_page(
+                news, request.GET.get('cursor'), version
+            ),
+            'pending_comments': pending,
+        }
+        if user.is_authenticated:
+            context['form'] = CommentForm()
+        response = TemplateResponse(request, NewsDetail.template_name, context)
+        return with_etag(response, etag)
+
+
+class AsyncNewsDetailView(generic.View):
+    """Чтение асинхронно, отправка комментария — прежним представлением."""
+    replica_reads = True
+
+    async def get(self, request, *args, **kwargs):
+        return await AsyncNewsDetail.as_view()(request, *args, **kwargs)
+
+    async def post(self, request, *args, **kwargs):
+        view = sync_to_async(NewsComment.as_view())
+        return await view(request, *args, **kwargs)
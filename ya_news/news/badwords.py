@@ -0,0 +1,118 @@
+import os
+from collections import deque
+from threading import Lock
+
+from django.conf import settings
+
+
+def normalize(text):
+    """Приводит текст к виду для сравнения: без регистра и с «е» вместо «ё»."""
+    return text.casefold().replace('ё', 'е')
+
+
+class Automaton:
+    """
+    Автомат Ахо — Корасик по набору слов.
+
+    Ищет вхождение любого из слов за один проход по тексту, поэтому время
+    проверки не зависит от размера словаря.
+    """
+
+    def __init__(self, words):
+        self.transitions = [{}]
+        self.fail = [0]
+        self.terminal = [False]
+        for word in words:
+            self._add(normalize(word))
+        self._link()
+
+    def _add(self, word):
+        if not word:
+            return
+        state = 0
+        for char in word:
+            next_state = self.transitions[state].get(char)
+            if next_state is None:
+                next_state = len(self.transitions)
+                self.transitions[state][char] = next_state
+                self.transitions.append({})
+                self.fail.append(0)
+                self.terminal.append(False)
+            state = next_state
+        self.terminal[state] = True
+
+    def _link(self):
+        """Строит суффиксные ссылки обходом бора в ширину."""
+        queue = deque(self.transitions[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self.transitions[state].items():
+                fail = self.fail[state]
+                while fail and char not in self.transitions[fail]:
+                    fail = self.fail[fail]
+                self.fail[next_state] = self.transitions[fail].get(char, 0)
+                self.terminal[next_state] |= self.terminal[
+                    self.fail[next_state]
+                ]
+                queue.append(next_state)
+
+    def search(self, text):
+        """Есть ли в тексте хотя бы одно слово из набора."""
+        transitions, fail, terminal = (
+            self.transitions, self.fail, self.terminal
+        )
+        state = 0
+        for char in normalize(text):
+            while state and char not in transitions[state]:
+                state = fail[state]
+            state = transitions[state].get(char, 0)
+            if terminal[state]:
+                return True
+        return False
+
+
+class BadWordsFilter:
+    """
+    Фильтр запрещённых слов: встроенный список плюс файл из настроек.
+
+    Автомат строится один раз на процесс и перестраивается, только когда
+    меняется файл settings.BAD_WORDS_FILE (по одному слову на строку).
+    """
+
+    def __init__(self, words):
+        self.words = tuple(words)
+        self._automaton = None
+        self._source = None
+        self._lock = Lock()
+
+    @staticmethod
+    def _file_state(path):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    @staticmethod
+    def _read_words(path):
+        try:
+            with open(path, encoding='utf-8') as words_file:
+                return [line.strip() for line in words_file]
+        except OSError:
+            return []
+
+    def get_automaton(self):
+        path = getattr(settings, 'BAD_WORDS_FILE', None)
+        source = (path, path and self._file_state(path))
+        if source != self._source:
+            with self._lock:
+                if source != self._source:
+                    words = self.words
+                    if path:
+                        words += tuple(self._read_words(path))
+                    self._automaton = Automaton(words)
+                    self._source = source
+        return self._automaton
+
+    def search(self, text):
+        return self.get_automaton().search(text)
@@ -0,0 +1,75 @@
+import hashlib
+import time
+
+from django.core.cache import cache
+
+FEED_VERSION_KEY = 'news:feed:version'
+NEWS_VERSION_KEY = 'news:{news_id}:version'
+COMMENTS_PAGE_KEY = 'news:{news_id}:comments:{version}:{cursor}'
+
+
+def get_version(key):
+    """
+    Текущая версия данных под ключом key.
+
+    Начальное значение берём от времени, чтобы после вытеснения ключа
+    из кеша версии не начинались заново и не совпали со старыми.
+    """
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+async def aget_version(key):
+    """Асинхронный вариант get_version."""
+    version = await cache.aget(key)
+    if version is None:
+        await cache.aadd(key, time.time_ns(), timeout=None)
+        version = await cache.aget(key)
+    return version
+
+
+def bump_version(key):
+    """Делает недействительным всё, что закешировано по старой версии."""
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, time.time_ns(), timeout=None)
+
+
+def get_feed_version():
+    """Версия ленты: меняется при любой записи новостей и комментариев."""
+    return get_version(FEED_VERSION_KEY)
+
+
+def bump_feed_version():
+    bump_version(FEED_VERSION_KEY)
+
+
+def get_news_version(news_id):
+    """Версия страницы новости: самой новости и её комментариев."""
+    return get_version(NEWS_VERSION_KEY.format(news_id=news_id))
+
+
+async def aget_feed_version():
+    return await aget_version(FEED_VERSION_KEY)
+
+
+async def aget_news_version(news_id):
+    return await aget_version(NEWS_VERSION_KEY.format(news_id=news_id))
+
+
+def bump_news_version(news_id):
+    bump_version(NEWS_VERSION_KEY.format(news_id=news_id))
+
+
+def comments_page_key(news_id, cursor, version=None):
+    if version is None:
+        version = get_news_version(news_id)
+    return COMMENTS_PAGE_KEY.format(
+        news_id=news_id,
+        version=version,
+        cursor=hashlib.md5((cursor or '').encode()).hexdigest(),
+    )
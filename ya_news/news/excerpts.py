@@ -0,0 +1,40 @@
+"""
+Анонсы новостей для ленты.
+
+Анонс — первые EXCERPT_WORDS слов текста, как у фильтра truncatewords.
+Он хранится в News.excerpt, чтобы лента не загружала полный текст
+новостей и не разбирала его на слова при каждом запросе.
+"""
+from django.db import transaction
+from django.utils.text import Truncator
+
+EXCERPT_WORDS = 15
+
+
+def make_excerpt(text):
+    return Truncator(text).words(EXCERPT_WORDS, truncate=' …')
+
+
+def backfill_excerpts(queryset, chunk_size=1000):
+    """
+    Заново считает анонсы новостей queryset пачками по chunk_size.
+
+    Новости обходятся по id, каждая пачка пишется своей транзакцией.
+    Возвращает число обновлённых новостей.
+    """
+    updated = 0
+    last_pk = 0
+    queryset = queryset.order_by('pk')
+    while rows := list(queryset.filter(pk__gt=last_pk).values_list(
+        'pk', 'text'
+    )[:chunk_size]):
+        with transaction.atomic(using=queryset.db):
+            updated += queryset.bulk_update(
+                [
+                    queryset.model(pk=pk, excerpt=make_excerpt(text))
+                    for pk, text in rows
+                ],
+                ['excerpt'],
+            )
+        last_pk = rows[-1][0]
+    return updated
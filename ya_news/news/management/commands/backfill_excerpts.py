@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS
+
+from news.cache import bump_feed_version
+from news.excerpts import backfill_excerpts
+from news.models import News
+
+
+class Command(BaseCommand):
+    help = (
+        'Заново считает анонсы новостей для ленты. Новости обходятся '
+        'пачками по id, каждая пачка в своей транзакции.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+        parser.add_argument(
+            '--chunk-size', type=int, default=1000,
+            help='Сколько новостей обновлять за одну транзакцию.',
+        )
+        parser.add_argument(
+            '--missing', action='store_true',
+            help='Только новости без анонса.',
+        )
+
+    def handle(self, *args, **options):
+        queryset = News.objects.using(options['database'])
+        if options['missing']:
+            queryset = queryset.filter(excerpt='')
+        updated = backfill_excerpts(queryset, options['chunk_size'])
+        bump_feed_version()
+        self.stdout.write(self.style.SUCCESS(
+            f'Обновлено анонсов: {updated}.'
+        ))
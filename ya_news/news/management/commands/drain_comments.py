@@ -0,0 +1,44 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from news.spool import drain, get_spool
+
+
+class Command(BaseCommand):
+    help = (
+        'Переносит комментарии из очереди отложенной записи в БД пачками. '
+        'Без --once работает, пока его не остановят.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Разобрать очередь до конца и выйти.',
+        )
+        parser.add_argument(
+            '--interval', type=float, default=1.0,
+            help='Сколько секунд ждать, если очередь пуста.',
+        )
+        parser.add_argument(
+            '--batch-size', type=int,
+            default=settings.COMMENTS_SPOOL_BATCH_SIZE,
+            help='Сколько комментариев записывать одной пачкой.',
+        )
+
+    def handle(self, *args, **options):
+        spool = get_spool()
+        total = 0
+        while True:
+            written = drain(spool, options['batch_size'])
+            total += written
+            if written:
+                self.stdout.write(f'Разобрано из очереди: {written}.')
+            elif options['once']:
+                break
+            else:
+                time.sleep(options['interval'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Очередь разобрана, всего строк: {total}.'
+        ))
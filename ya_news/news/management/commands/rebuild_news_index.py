@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+from news.models import Comment, News
+from news.search import rebuild_index, supports_index
+
+
+class Command(BaseCommand):
+    help = (
+        'Заново строит поисковый индекс по новостям и комментариям. '
+        'Сайт на время перестроения лучше остановить: поиск будет пустым.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Сколько строк записывать в индекс за раз.',
+        )
+
+    def handle(self, *args, **options):
+        using = options['database']
+        if not supports_index(using):
+            raise CommandError(
+                'Поисковый индекс поддерживается только SQLite.'
+            )
+        with transaction.atomic(using=using):
+            rebuild_index(
+                News.objects.using(using).values_list(
+                    'id', 'title', 'text'
+                ).iterator(chunk_size=options['batch_size']),
+                Comment.objects.using(using).values_list(
+                    'id', 'text', 'news_id'
+                ).iterator(chunk_size=options['batch_size']),
+                using=using,
+                batch_size=options['batch_size'],
+            )
+        self.stdout.write(self.style.SUCCESS('Поисковый индекс перестроен.'))
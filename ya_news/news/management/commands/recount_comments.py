@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+from news.models import News
+
+
+class Command(BaseCommand):
+    help = (
+        'Сверяет счётчики комментариев новостей с таблицей комментариев '
+        'и исправляет расхождения. Новости обходятся пачками по id, '
+        'каждая пачка в своей транзакции.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+        parser.add_argument(
+            '--chunk-size', type=int, default=1000,
+            help='Сколько новостей сверять за одну транзакцию.',
+        )
+
+    def handle(self, *args, **options):
+        queryset = News.objects.using(options['database']).order_by('pk')
+        fixed = 0
+        last_pk = 0
+        while pks := list(queryset.filter(pk__gt=last_pk).values_list(
+            'pk', flat=True
+        )[:options['chunk_size']]):
+            with transaction.atomic(using=options['database']):
+                fixed += queryset.filter(pk__in=pks).recount_comments()
+            last_pk = pks[-1]
+        self.stdout.write(self.style.SUCCESS(
+            f'Исправлено счётчиков: {fixed}.'
+        ))
@@ -0,0 +1,106 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, IntegrityError, transaction
+
+from news.models import Comment, News
+from news.search import rebuild_index, supports_index
+from news.seeding import (
+    bulk_insert, deferred_indexes, fixture_objects, iter_json_array,
+    seed_synthetic
+)
+from news.signals import news_batch_changed
+
+
+class Command(BaseCommand):
+    help = (
+        'Быстро наполняет базу новостями и комментариями из фикстур JSON '
+        'и синтетическими данными. Индексы таблиц на время загрузки '
+        'удаляются, поэтому запускайте команду на остановленном сайте.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'fixtures', nargs='*',
+            help='Файлы фикстур с объектами news.news и news.comment.',
+        )
+        parser.add_argument('--users', type=int, default=0)
+        parser.add_argument('--news', type=int, default=0)
+        parser.add_argument('--comments-per-news', type=int, default=0)
+        parser.add_argument(
+            '--seed', type=int, default=0,
+            help='С одним seed синтетические данные всегда одинаковы.',
+        )
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+        parser.add_argument(
+            '--keep-indexes', action='store_true',
+            help='Не удалять индексы на время загрузки.',
+        )
+        parser.add_argument(
+            '--skip-search-index', action='store_true',
+            help='Не перестраивать поисковый индекс после загрузки.',
+        )
+
+    def seed(self, options):
+        """Загружает данные и возвращает число строк и id новостей."""
+        using = options['database']
+        rows = 0
+        news_ids = set()
+        for path in options['fixtures']:
+            with open(path, encoding='utf-8') as fixture:
+                fixture_rows, fixture_news_ids = bulk_insert(
+                    fixture_objects(iter_json_array(fixture)),
+                    options['batch_size'], using,
+                )
+            rows += fixture_rows
+            news_ids |= fixture_news_ids
+        if options['news']:
+            synthetic_rows, synthetic_news_ids = seed_synthetic(
+                options['users'], options['news'],
+                options['comments_per_news'], options['seed'],
+                options['batch_size'], using,
+            )
+            rows += synthetic_rows
+            news_ids.update(synthetic_news_ids)
+        return rows, news_ids
+
+    def handle(self, *args, **options):
+        using = options['database']
+        if options['comments_per_news'] and not options['users']:
+            raise CommandError('Комментариям нужны авторы: укажите --users.')
+        started = time.perf_counter()
+        try:
+            with transaction.atomic(using=using):
+                if options['keep_indexes']:
+                    rows, news_ids = self.seed(options)
+                else:
+                    with deferred_indexes((News, Comment), using):
+                        rows, news_ids = self.seed(options)
+        except (OSError, ValueError) as error:
+            raise CommandError(error)
+        except IntegrityError as error:
+            raise CommandError(
+                f'Данные конфликтуют с уже загруженными: {error}. '
+                f'Фикстуры с явными pk загружаются в базу только один раз.'
+            )
+        seconds = time.perf_counter() - started
+        self.stdout.write(
+            f'Записано {rows} строк за {seconds:.1f} с '
+            f'({rows / seconds if seconds else 0:.0f} строк/с).'
+        )
+        if supports_index(using) and not options['skip_search_index']:
+            with transaction.atomic(using=using):
+                rebuild_index(
+                    News.objects.using(using).values_list(
+                        'id', 'title', 'text'
+                    ).iterator(chunk_size=options['batch_size']),
+                    Comment.objects.using(using).values_list(
+                        'id', 'text', 'news_id'
+                    ).iterator(chunk_size=options['batch_size']),
+                    using=using,
+                    batch_size=options['batch_size'],
+                )
+        # Кеш мог пережить очистку базы: id новостей совпадут со старыми.
+        news_batch_changed(news_ids)
+        self.stdout.write(self.style.SUCCESS('База наполнена.'))
@@ -0,0 +1,78 @@
+import re
+from itertools import islice
+
+import snowballstemmer
+from django.db import migrations
+
+CREATE_SQL = (
+    'CREATE VIRTUAL TABLE news_news_fts USING fts5(title, text)',
+    'CREATE VIRTUAL TABLE news_comment_fts '
+    'USING fts5(text, news_id UNINDEXED)',
+)
+DROP_SQL = (
+    'DROP TABLE IF EXISTS news_news_fts',
+    'DROP TABLE IF EXISTS news_comment_fts',
+)
+# Индексация на момент миграции: код news.search может меняться,
+# а миграция должна работать с той схемой, для которой написана.
+WORD = re.compile(r'\w+')
+BATCH_SIZE = 1000
+
+
+def create_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for sql in CREATE_SQL:
+        schema_editor.execute(sql)
+    stemmer = snowballstemmer.stemmer('russian')
+
+    def index_text(text):
+        return ' '.join(stemmer.stemWords(WORD.findall(text.casefold())))
+
+    using = schema_editor.connection.alias
+    news = apps.get_model('news', 'News').objects.using(using).values_list(
+        'id', 'title', 'text'
+    ).iterator(chunk_size=BATCH_SIZE)
+    comments = apps.get_model('news', 'Comment').objects.using(
+        using
+    ).values_list('id', 'text', 'news_id').iterator(chunk_size=BATCH_SIZE)
+    with schema_editor.connection.cursor() as cursor:
+        for sql, rows in (
+            (
+                'INSERT INTO news_news_fts(rowid, title, text) '
+                'VALUES (%s, %s, %s)',
+                (
+                    (pk, index_text(title), index_text(text))
+                    for pk, title, text in news
+                ),
+            ),
+            (
+                'INSERT INTO news_comment_fts(rowid, text, news_id) '
+                'VALUES (%s, %s, %s)',
+                (
+                    (pk, index_text(text), news_id)
+                    for pk, text, news_id in comments
+                ),
+            ),
+        ):
+            while batch := list(islice(rows, BATCH_SIZE)):
+                cursor.executemany(sql, batch)
+
+
+def drop_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for sql in DROP_SQL:
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+    """Таблицы FTS5 для поиска по новостям и комментариям."""
+
+    dependencies = [
+        ('news', '0002_composite_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
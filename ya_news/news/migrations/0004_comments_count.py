@@ -0,0 +1,25 @@
+# Generated by Django 5.1.1 on 2026-10-18 15:55
+
+from django.db import migrations, models
+
+RECOUNT_SQL = (
+    'UPDATE news_news SET comments_count = ('
+    'SELECT COUNT(*) FROM news_comment '
+    'WHERE news_comment.news_id = news_news.id)'
+)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0003_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='news',
+            name='comments_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Комментариев'),
+        ),
+        migrations.RunSQL(RECOUNT_SQL, migrations.RunSQL.noop),
+    ]
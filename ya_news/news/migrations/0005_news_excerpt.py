@@ -0,0 +1,45 @@
+# Generated by Django 5.1.1 on 2026-10-18 16:20
+
+from django.db import migrations, models
+from django.utils.text import Truncator
+
+# Анонс на момент миграции: news.excerpts может меняться.
+EXCERPT_WORDS = 15
+BATCH_SIZE = 1000
+
+
+def fill_excerpts(apps, schema_editor):
+    news = apps.get_model('news', 'News')
+    queryset = news.objects.using(
+        schema_editor.connection.alias
+    ).order_by('pk')
+    last_pk = 0
+    while rows := list(queryset.filter(pk__gt=last_pk).values_list(
+        'pk', 'text'
+    )[:BATCH_SIZE]):
+        queryset.bulk_update(
+            [
+                news(pk=pk, excerpt=Truncator(text).words(
+                    EXCERPT_WORDS, truncate=' …'
+                ))
+                for pk, text in rows
+            ],
+            ['excerpt'],
+        )
+        last_pk = rows[-1][0]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0004_comments_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='news',
+            name='excerpt',
+            field=models.TextField(blank=True, editable=False, verbose_name='Анонс'),
+        ),
+        migrations.RunPython(fill_excerpts, migrations.RunPython.noop),
+    ]
@@ -1,22 +1,108 @@
+from collections import Counter
 from datetime import datetime
 
 from django.conf import settings
 from django.db import models
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .excerpts import make_excerpt
+
+
+class NewsQuerySet(models.QuerySet):
+
+    def bulk_create(self, objs, *args, **kwargs):
+        """Метод save не вызывается, поэтому анонсы считаем здесь."""
+        objs = list(objs)
+        for news in objs:
+            news.excerpt = make_excerpt(news.text)
+        return super().bulk_create(objs, *args, **kwargs)
+
+    def add_comments(self, counts):
+        """
+        Прибавляет к счётчикам комментариев числа из словаря counts.
+
+        Счётчик меняется выражением F в самом UPDATE, поэтому
+        одновременные записи не затирают друг друга.
+        """
+        for news_id, count in counts.items():
+            self.filter(pk=news_id).update(
+                comments_count=F('comments_count') + count
+            )
+
+    def recount_comments(self):
+        """
+        Пересчитывает счётчики комментариев по таблице комментариев.
+
+        Обновляются только расходящиеся строки; возвращает их число.
+        """
+        actual = Coalesce(Subquery(
+            Comment.objects.filter(news=OuterRef('pk')).order_by().values(
+                'news'
+            ).annotate(count=Count('pk')).values('count')
+        ), 0)
+        return self.annotate(actual=actual).exclude(
+            comments_count=F('actual')
+        ).update(comments_count=actual)
 
 
 class News(models.Model):
     title = models.CharField(max_length=50)
     text = models.TextField()
+    excerpt = models.TextField('Анонс', blank=True, editable=False)
     date = models.DateField(default=datetime.today)
+    comments_count = models.PositiveIntegerField(
+        'Комментариев', default=0, editable=False
+    )
+
+    objects = NewsQuerySet.as_manager()
 
     class Meta:
         ordering = ('-date',)
+        indexes = (
+            models.Index(fields=('-date', '-id'), name='news_date_id_idx'),
+        )
         verbose_name_plural = 'Новости'
         verbose_name = 'Новость'
 
     def __str__(self):
         return self.title
 
+    def save(self, *args, **kwargs):
+        """
+        Не трогает comments_count при обновлении и пишет анонс с текстом.
+
+        Счётчик в загруженном объекте мог устареть, пока новость
+        редактировали, а ведут его сигналы комментариев. Анонс считает
+        обработчик pre_save, в том числе для loaddata.
+        """
+        update_fields = kwargs.get('update_fields')
+        deferred = self.get_deferred_fields()
+        if not self._state.adding:
+            if update_fields is None:
+                update_fields = [
+                    field.name for field in self._meta.concrete_fields
+                    if not field.primary_key
+                    and field.name != 'comments_count'
+                    and field.attname not in deferred
+                ]
+            elif 'text' in update_fields:
+                update_fields = {*update_fields, 'excerpt'}
+            kwargs['update_fields'] = update_fields
+        super().save(*args, **kwargs)
+
+
+class CommentQuerySet(models.QuerySet):
+
+    def bulk_create(self, objs, *args, **kwargs):
+        """Сигналы не отправляются, поэтому счётчики правим здесь."""
+        objs = super().bulk_create(objs, *args, **kwargs)
+        News.objects.using(self.db).add_comments(
+            Counter(obj.news_id for obj in objs)
+        )
+        return objs
+
 
 class Comment(models.Model):
     news = models.ForeignKey(
@@ -28,10 +114,20 @@ class Comment(models.Model):
         on_delete=models.CASCADE,
     )
     text = models.TextField()
-    created = models.DateTimeField(auto_now_add=True)
+    # Не auto_now_add: отложенная запись переносит время отправки из очереди.
+    created = models.DateTimeField(default=timezone.now, editable=False)
+
+    objects = CommentQuerySet.as_manager()
 
     class Meta:
         ordering = ('created',)
+        indexes = (
+            models.Index(
+                fields=('news', 'created', 'id'),
+                name='comment_news_created_idx',
+            ),
+            models.Index(fields=('author', 'id'), name='comment_author_idx'),
+        )
 
     def __str__(self):
         return self.text[:50]
@@ -0,0 +1,177 @@
+import base64
+import binascii
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from django.http import Http404
+from django.utils.functional import cached_property
+
+NEXT = 'n'
+PREVIOUS = 'p'
+INVALID_CURSOR = 'Некорректный курсор страницы.'
+
+
+def encode_cursor(direction, values):
+    """Упаковывает направление и значения ключа в непрозрачный токен."""
+    payload = json.dumps([direction, *(
+        value.isoformat() if hasattr(value, 'isoformat') else value
+        for value in values
+    )])
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Распаковывает токен курсора в направление и сырые значения ключа."""
+    try:
+        payload = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        direction, *values = json.loads(payload)
+    except (binascii.Error, UnicodeDecodeError, ValueError, TypeError):
+        raise Http404(INVALID_CURSOR)
+    if direction not in (NEXT, PREVIOUS):
+        raise Http404(INVALID_CURSOR)
+    return direction, values
+
+
+class KeysetPaginator:
+    """
+    Постраничный вывод по ключу сортировки (keyset/seek).
+
+    Вместо OFFSET страница выбирается условием «строго после ключа
+    граничной записи», поэтому тысячная страница стоит столько же,
+    сколько первая. Последним полем ordering должен быть уникальный
+    ключ, например id.
+    """
+
+    def __init__(self, queryset, ordering, per_page):
+        self.queryset = queryset.order_by(*ordering)
+        self.ordering = ordering
+        self.per_page = per_page
+
+    @property
+    def field_names(self):
+        return [field.lstrip('-') for field in self.ordering]
+
+    def get_page(self, cursor=None):
+        if not cursor:
+            return KeysetPage(self, None, None)
+        direction, raw_values = decode_cursor(cursor)
+        if len(raw_values) != len(self.ordering) or not all(
+            isinstance(value, (str, int)) and not isinstance(value, bool)
+            for value in raw_values
+        ):
+            raise Http404(INVALID_CURSOR)
+        opts = self.queryset.model._meta
+        try:
+            values = [
+                opts.get_field(name).to_python(value)
+                for name, value in zip(self.field_names, raw_values)
+            ]
+        except (ValidationError, TypeError, ValueError):
+            raise Http404(INVALID_CURSOR)
+        return KeysetPage(self, direction, values)
+
+    def key(self, obj):
+        return [getattr(obj, name) for name in self.field_names]
+
+    def seek(self, values, forward=True):
+        """
+        Условие «запись идёт после ключа values» в порядке ordering.
+
+        Первое поле вынесено в отдельное нестрогое сравнение, чтобы
+        СУБД могла выбрать диапазон по составному индексу.
+        """
+        condition = Q()
+        equal = Q()
+        for field, value in zip(self.ordering, values):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') == forward else 'gt'
+            condition |= equal & Q(**{f'{name}__{lookup}': value})
+            equal &= Q(**{name: value})
+        field, value = self.ordering[0], values[0]
+        lookup = 'lte' if field.startswith('-') == forward else 'gte'
+        return Q(**{f'{field.lstrip("-")}__{lookup}': value}) & condition
+
+
+class KeysetPage:
+    """Страница keyset-пагинации с курсорами соседних страниц."""
+
+    def __init__(self, paginator, direction, values):
+        self.paginator = paginator
+        self.direction = direction
+        self.values = values
+        queryset = paginator.queryset
+        per_page = paginator.per_page
+        if direction is None:
+            self.object_list = queryset[:per_page]
+        elif direction == NEXT:
+            self.object_list = queryset.filter(
+                paginator.seek(values)
+            )[:per_page]
+        else:
+            # Берём ближайшие записи в обратном порядке, а отдаём в прямом.
+            preceding = queryset.filter(
+                paginator.seek(values, forward=False)
+            ).reverse()[:per_page]
+            self.object_list = queryset.filter(
+                pk__in=preceding.values('pk')
+            )
+
+    @cached_property
+    def items(self):
+        return list(self.object_list)
+
+    def _more(self, forward):
+        """
+        Есть ли записи за краем страницы в направлении forward.
+
+        Возвращает bool, если ответ известен без БД, иначе queryset,
+        у которого осталось проверить exists().
+        """
+        if self.direction == (PREVIOUS if forward else NEXT):
+            return True
+        if self.direction is None and not forward:
+            return False
+        if len(self.items) < self.paginator.per_page:
+            return False
+        edge = self.items[-1] if forward else self.items[0]
+        return self.paginator.queryset.filter(
+            self.paginator.seek(self.paginator.key(edge), forward=forward)
+        )
+
+    @cached_property
+    def has_next(self):
+        more = self._more(forward=True)
+        return more if isinstance(more, bool) else more.exists()
+
+    @cached_property
+    def has_previous(self):
+        more = self._more(forward=False)
+        return more if isinstance(more, bool) else more.exists()
+
+    async def aload(self):
+        """Загружает страницу через асинхронный ORM."""
+        self.items = [obj async for obj in self.object_list]
+        for name, forward in (('has_next', True), ('has_previous', False)):
+            more = self._more(forward)
+            if not isinstance(more, bool):
+                more = await more.aexists()
+            setattr(self, name, more)
+
+    @property
+    def next_cursor(self):
+        if not self.has_next:
+            return None
+        values = (
+            self.paginator.key(self.items[-1]) if self.items else self.values
+        )
+        return encode_cursor(NEXT, values)
+
+    @property
+    def previous_cursor(self):
+        if not self.has_previous:
+            return None
+        values = (
+            self.paginator.key(self.items[0]) if self.items else self.values
+        )
+        return encode_cursor(PREVIOUS, values)
@@ -0,0 +1,31 @@
+"""Маршруты проекта на асинхронных представлениях для тестов под ASGI."""
+from django.contrib import admin
+from django.urls import include, path
+
+from common.login import AsyncLoginView
+from news import async_views, urls as news_urls
+from yanews import urls
+
+news_patterns = [
+    path('', async_views.AsyncNewsList.as_view(), name='home'),
+    path(
+        'news/<int:pk>/',
+        async_views.AsyncNewsDetailView.as_view(),
+        name='detail',
+    ),
+    *(
+        pattern for pattern in news_urls.urlpatterns
+        if pattern.name not in ('home', 'detail')
+    ),
+]
+
+auth_patterns = [
+    path('login/', AsyncLoginView.as_view(), name='login'),
+    *(pattern for pattern in urls.auth_urls[0] if pattern.name != 'login'),
+]
+
+urlpatterns = [
+    path('', include((news_patterns, 'news'))),
+    path('admin/', admin.site.urls),
+    path('auth/', include((auth_patterns, 'users'))),
+]
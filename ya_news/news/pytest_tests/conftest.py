@@ -1,9 +1,16 @@
 import pytest
 from django.conf import settings
+from django.core.cache import cache
 from django.test.client import Client
 from django.urls import reverse
 
 from news.models import Comment, News
+from news.spool import get_spool
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    cache.clear()
 
 
 @pytest.fixture
@@ -60,6 +67,27 @@ def news_list():
     )
 
 
+@pytest.fixture
+def replica(settings):
+    """Чтение с реплики, которая в тестах смотрит в основную БД."""
+    settings.DATABASE_REPLICAS = ['replica']
+
+
+@pytest.fixture
+def comment_spool(settings, tmp_path):
+    """Отложенная запись комментариев в очередь во временном файле."""
+    settings.COMMENTS_WRITE_BEHIND = True
+    settings.COMMENTS_SPOOL_PATH = tmp_path / 'spool.sqlite3'
+    return get_spool()
+
+
+@pytest.fixture
+def asgi_client(settings, async_client):
+    """Клиент ASGI, лента, новость и вход — асинхронные представления."""
+    settings.ROOT_URLCONF = 'news.pytest_tests.async_urls'
+    return async_client
+
+
 @pytest.fixture
 def news_detail_url(news_id):
     return reverse('news:detail', args=(news_id,))
@@ -85,6 +113,11 @@ def home_url():
     return reverse('news:home')
 
 
+@pytest.fixture
+def search_url():
+    return reverse('news:search')
+
+
 @pytest.fixture
 def news_detail_url(news):
     return reverse('news:detail', args=(news.id,))
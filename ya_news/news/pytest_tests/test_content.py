@@ -1,11 +1,40 @@
+import tracemalloc
+from http import HTTPStatus
+from unittest import mock
+
 import pytest
+from asgiref.sync import async_to_sync
 from django.conf import settings
+from django.core.cache import cache
+from django.core.handlers.base import BaseHandler
+from django.db import connections
+from django.template import engines
+from django.template.loaders.filesystem import Loader
+from django.test.client import AsyncClient
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
+from common.querybudget import assert_query_budget
+from common.warmup import warm_templates
+from news.cache import comments_page_key
 from news.forms import CommentForm
+from news.models import Comment, News
+from yanews.replicas import PIN_COOKIE
 
 pytestmark = pytest.mark.django_db
 
+COMMENTS_PER_NEWS = (10, 1000)
+COMMENT_TEXT = 'Очень длинный комментарий. ' * 40
+
+QUERY_BUDGET_PAGES = (
+    ('news:home', None, 'client'),
+    ('news:home', None, 'author_client'),
+    ('news:detail', 'news_id', 'client'),
+    ('news:detail', 'news_id', 'author_client'),
+    ('news:edit', 'comment_id', 'author_client'),
+    ('news:delete', 'comment_id', 'author_client'),
+)
+
 
 @pytest.mark.django_db
 def test_news_count_on_home_page(client, news_list):
@@ -22,6 +51,264 @@ def test_news_sorted_by_date(client, home_url):
     assert news_dates == sorted(news_dates, reverse=True)
 
 
+def test_home_page_cost_does_not_grow_with_comments(
+        client, home_url, news_list, author, django_assert_num_queries):
+    """Тест запросы и память главной не зависят от числа комментариев."""
+    peaks = []
+    created = 0
+    for comments_per_news in COMMENTS_PER_NEWS:
+        Comment.objects.bulk_create(
+            Comment(news=news, author=author, text=COMMENT_TEXT)
+            for news in news_list
+            for _ in range(comments_per_news - created)
+        )
+        created = comments_per_news
+        tracemalloc.start()
+        with django_assert_num_queries(2):
+            response = client.get(home_url)
+        peaks.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+        counts = {news.comments_count for news in response.context[
+            'object_list']}
+        assert counts == {comments_per_news}
+    assert peaks[-1] < peaks[0] * 1.5
+
+
+@pytest.mark.usefixtures('news_list', 'comment')
+@pytest.mark.parametrize('name, arg_name, user_client', QUERY_BUDGET_PAGES)
+def test_pages_within_query_budget(request, name, arg_name, user_client):
+    """Тест страницы укладываются в бюджет запросов из настроек."""
+    client = request.getfixturevalue(user_client)
+    args = (request.getfixturevalue(arg_name),) if arg_name else ()
+    response = client.get(reverse(name, args=args))
+    assert_query_budget(response)
+    assert response['Server-Timing'].startswith('db;dur=')
+
+
+def test_search_stems_and_ranks(client, search_url, author, news):
+    """Тест поиск находит словоформы, совпадение в заголовке выше."""
+    in_title = News.objects.create(title='Ёлки в парке', text='Текст')
+    in_text = News.objects.create(title='Парк', text='Посадили ёлку')
+    Comment.objects.create(news=news, author=author, text='А где ёлочка?')
+    response = client.get(search_url, {'q': 'елками'})
+    assert_query_budget(response)
+    assert response.context['object_list'] == [in_title, in_text]
+    response = client.get(search_url, {'q': 'ёлочкой'})
+    assert response.context['object_list'] == [news]
+
+
+def test_search_paginated(client, search_url, news_list):
+    """Тест выдача поиска разбита на страницы."""
+    for news in news_list:
+        news.save()
+    for page, expected in ((1, settings.NEWS_SEARCH_PAGE_SIZE), (2, 1)):
+        response = client.get(search_url, {'q': 'новость', 'page': page})
+        assert len(response.context['object_list']) == expected
+
+
+@pytest.mark.parametrize('query', ('', '"', 'AND OR', 'text:*', '(('))
+def test_search_ignores_query_syntax(client, search_url, news, query):
+    """Тест операторы FTS5 во вводе не ломают поиск."""
+    response = client.get(search_url, {'q': query})
+    assert response.status_code == HTTPStatus.OK
+
+
+@pytest.mark.django_db(transaction=True, databases=['default', 'replica'])
+@pytest.mark.usefixtures('replica', 'comment')
+@pytest.mark.parametrize('url_fixture', ('home_url', 'news_detail_url'))
+@pytest.mark.parametrize('client_fixture', ('client', 'asgi_client'))
+def test_news_pages_read_from_replica(request, client_fixture, url_fixture):
+    """Тест лента и новость читаются с реплики и под WSGI, и под ASGI."""
+    client = request.getfixturevalue(client_fixture)
+    url = request.getfixturevalue(url_fixture)
+    get = client.get
+    if isinstance(client, AsyncClient):
+        get = async_to_sync(get)
+    with CaptureQueriesContext(connections['replica']) as replica:
+        with CaptureQueriesContext(connections['default']) as default:
+            response = get(url)
+    assert response.status_code == HTTPStatus.OK
+    assert replica.captured_queries
+    assert not default.captured_queries
+    assert 'ETag' not in response
+
+
+@pytest.mark.django_db(transaction=True, databases=['default', 'replica'])
+@pytest.mark.usefixtures('replica')
+@pytest.mark.parametrize('client_fixture', ('client', 'asgi_client'))
+def test_replica_reads_not_cached(request, client_fixture, comment,
+                                  news_detail_url):
+    """Тест страница с реплики не попадает в кеш под текущей версией."""
+    client = request.getfixturevalue(client_fixture)
+    get = client.get
+    if isinstance(client, AsyncClient):
+        get = async_to_sync(get)
+    assert comment.text in get(news_detail_url).content.decode()
+    assert cache.get(comments_page_key(comment.news_id, None)) is None
+    client.cookies[PIN_COOKIE] = '1'
+    response = get(news_detail_url)
+    assert 'ETag' in response
+    assert cache.get(comments_page_key(comment.news_id, None)) is not None
+
+
+def test_feed_not_modified_until_comment_written(
+        client, home_url, news_list, author, django_assert_num_queries,
+        django_capture_on_commit_callbacks):
+    """Тест неизменённая лента отдаётся ответом 304 без запросов к БД."""
+    etag = client.get(home_url)['ETag']
+    with django_assert_num_queries(0):
+        response = client.get(home_url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == HTTPStatus.NOT_MODIFIED
+    with django_capture_on_commit_callbacks(execute=True):
+        Comment.objects.create(news=news_list[0], author=author, text='Ещё')
+    response = client.get(home_url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == HTTPStatus.OK
+
+
+def test_news_etag_depends_on_user(
+        author_client, not_author_client, news_detail_url):
+    """Тест ETag страницы новости одного пользователя не подходит другому."""
+    etag = author_client.get(news_detail_url)['ETag']
+    response = author_client.get(news_detail_url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == HTTPStatus.NOT_MODIFIED
+    response = not_author_client.get(
+        news_detail_url, HTTP_IF_NONE_MATCH=etag
+    )
+    assert response.status_code == HTTPStatus.OK
+
+
+def test_feed_renders_excerpt_without_text(client, home_url):
+    """Тест лента показывает анонс и не загружает полный текст новости."""
+    News.objects.create(
+        title='Лонгрид', text='Начало статьи. ' + 'слово ' * 17000
+    )
+    with CaptureQueriesContext(connections['default']) as queries:
+        response = client.get(home_url)
+    assert not any(
+        '"news_news"."text"' in query['sql']
+        for query in queries.captured_queries
+    )
+    news = response.context['object_list'][0]
+    assert news.get_deferred_fields() == {'text'}
+    assert 'Начало статьи. слово' in response.content.decode()
+    assert len(response.content) < 10_000
+
+
+def test_home_page_cursor_pagination(client, home_url, news_list):
+    """Тест по курсорам лента листается вперёд и назад без пропусков."""
+    first_page = client.get(home_url).context['page_obj']
+    assert not first_page.has_previous
+    second_page = client.get(
+        home_url, {'cursor': first_page.next_cursor}
+    ).context['page_obj']
+    assert len(second_page.items) == (
+        len(news_list) - settings.NEWS_COUNT_ON_HOME_PAGE
+    )
+    assert not second_page.has_next
+    assert not set(first_page.items) & set(second_page.items)
+    back_page = client.get(
+        home_url, {'cursor': second_page.previous_cursor}
+    ).context['page_obj']
+    assert back_page.items == first_page.items
+    assert not back_page.has_previous
+
+
+def test_deep_pages_do_not_use_offset(
+        client, home_url, news_list, django_assert_num_queries):
+    """Тест страницы выбираются по ключу, а не через OFFSET."""
+    page = client.get(home_url).context['page_obj']
+    with django_assert_num_queries(1) as captured:
+        client.get(home_url, {'cursor': page.next_cursor})
+    assert all(
+        'OFFSET' not in query['sql'] for query in captured.captured_queries
+    )
+
+
+def test_comments_cursor_pagination(
+        client, settings, news, author, news_detail_url):
+    """Тест комментарии к новости выводятся по страницам."""
+    settings.COMMENTS_COUNT_ON_NEWS_PAGE = 2
+    comments = Comment.objects.bulk_create(
+        Comment(news=news, author=author, text=f'Комментарий {index}')
+        for index in range(settings.COMMENTS_COUNT_ON_NEWS_PAGE + 1)
+    )
+    first_page = client.get(news_detail_url).context['comments_page']
+    second_page = client.get(
+        news_detail_url, {'cursor': first_page.next_cursor}
+    ).context['comments_page']
+    assert [
+        comment.pk for comment in first_page.comments + second_page.comments
+    ] == [comment.pk for comment in comments]
+
+
+def test_comments_served_from_cache(
+        author_client, not_author_client, comment, news_detail_url,
+        django_assert_num_queries, django_capture_on_commit_callbacks):
+    """Тест список комментариев кешируется и сбрасывается при записи."""
+    author_client.get(news_detail_url)
+    with django_assert_num_queries(3):
+        response = not_author_client.get(news_detail_url)
+    assert comment.text in response.content.decode()
+    assert reverse('news:edit', args=(comment.id,)) not in (
+        response.content.decode()
+    )
+    response = author_client.get(news_detail_url)
+    assert reverse('news:edit', args=(comment.id,)) in (
+        response.content.decode()
+    )
+    with django_capture_on_commit_callbacks(execute=True):
+        author_client.post(news_detail_url, data={'text': 'Новый текст'})
+    response = not_author_client.get(news_detail_url)
+    assert 'Новый текст' in response.content.decode()
+
+
+def test_async_home_matches_sync(client, asgi_client, home_url, news_list,
+                                 comment):
+    """Тест асинхронная лента показывает те же новости, что и обычная."""
+    expected = client.get(home_url).context['page_obj'].items
+    response = async_to_sync(asgi_client.get)(home_url)
+    assert response.status_code == HTTPStatus.OK
+    page = response.context['page_obj']
+    assert page.items == expected
+    assert page.has_next
+    assert f'Комментариев: {expected[0].comments_count}' in (
+        response.content.decode()
+    )
+    assert response.query_report.view_name == 'news:home'
+    assert response.query_report.queries > 0
+
+
+def test_async_detail(asgi_client, author, comment, news_detail_url):
+    """Тест асинхронная страница новости с комментариями и ETag."""
+    asgi_client.force_login(author)
+    response = async_to_sync(asgi_client.get)(news_detail_url)
+    assert isinstance(response.context['form'], CommentForm)
+    content = response.content.decode()
+    assert comment.text in content
+    assert reverse('news:edit', args=(comment.id,)) in content
+    assert 'Server-Timing' in response
+    response = async_to_sync(asgi_client.get)(
+        news_detail_url, headers={'If-None-Match': response['ETag']}
+    )
+    assert response.status_code == HTTPStatus.NOT_MODIFIED
+
+
+def test_async_detail_not_found(asgi_client):
+    """Тест асинхронная страница несуществующей новости отдаёт 404."""
+    response = async_to_sync(asgi_client.get)(
+        reverse('news:detail', args=(0,))
+    )
+    assert response.status_code == HTTPStatus.NOT_FOUND
+
+
+def test_middleware_not_adapted_under_asgi(settings, caplog):
+    """Тест под ASGI цепочка middleware обходится без sync_to_async."""
+    settings.DEBUG = True
+    with caplog.at_level('DEBUG', logger='django.request'):
+        BaseHandler().load_middleware(is_async=True)
+    assert 'adapted' not in caplog.text
+
+
 def test_comments_sorted_by_creation_time(client, news_detail_url):
     """Тест комментарии идут в хронологическом порядке."""
     response = client.get(news_detail_url)
@@ -47,3 +334,104 @@ def test_comment_form_availability(
     assert ('form' in response.context) is form_in_context
     if form_in_context:
         assert isinstance(response.context['form'], CommentForm)
+
+
+def test_templates_warmed_up(client, home_url, news_detail_url, comment):
+    """Тест после прогрева страницы рендерятся без чтения шаблонов с диска."""
+    loader = engines['django'].engine.template_loaders[0]
+    loader.reset()
+    names = warm_templates()
+    assert {
+        'base.html', 'includes/header.html', 'news/home.html',
+        'news/detail.html', 'includes/comment.html',
+    } <= set(names)
+    assert set(names) <= set(loader.get_template_cache)
+    with mock.patch.object(Loader, 'get_contents', side_effect=AssertionError):
+        for url in (home_url, news_detail_url):
+            assert client.get(url).status_code == HTTPStatus.OK
+
+
+def test_admin_news_page_limits_comments(admin_client, news, author,
+                                         django_assert_max_num_queries):
+    """Тест админка показывает последние комментарии, а не все."""
+    limit = settings.COMMENTS_ADMIN_INLINE_LIMIT
+    Comment.objects.bulk_create(
+        Comment(news=news, author=author, text=f'Отзыв {index}')
+        for index in range(limit * 3)
+    )
+    url = reverse('admin:news_news_change', args=(news.pk,))
+    with django_assert_max_num_queries(limit + 15):
+        response = admin_client.get(url)
+    formset = response.context['inline_admin_formsets'][0].formset
+    assert [form.instance.text for form in formset.forms] == [
+        f'Отзыв {index}' for index in reversed(range(limit * 2, limit * 3))
+    ]
+    data = {
+        'title': 'Новый заголовок', 'text': news.text,
+        'date': news.date.strftime('%d.%m.%Y'),
+        'comment_set-TOTAL_FORMS': limit, 'comment_set-INITIAL_FORMS': limit,
+    }
+    for index, form in enumerate(formset.forms):
+        data.update({
+            f'comment_set-{index}-id': form.instance.pk,
+            f'comment_set-{index}-news': news.pk,
+            f'comment_set-{index}-author': author.pk,
+            f'comment_set-{index}-text': form.instance.text,
+        })
+    data['comment_set-0-DELETE'] = 'on'
+    response = admin_client.post(url, data)
+    assert response.status_code == HTTPStatus.FOUND
+    news.refresh_from_db()
+    assert news.title == 'Новый заголовок'
+    assert news.comments_count == limit * 3 - 1
+
+
+def test_admin_saves_shown_comments(settings, admin_client, news, author):
+    """Тест правка из админки не теряется, если пришёл новый комментарий."""
+    settings.COMMENTS_ADMIN_INLINE_LIMIT = 2
+    Comment.objects.bulk_create(
+        Comment(news=news, author=author, text=f'Отзыв {index}')
+        for index in range(3)
+    )
+    url = reverse('admin:news_news_change', args=(news.pk,))
+    formset = admin_client.get(url).context[
+        'inline_admin_formsets'
+    ][0].formset
+    newest, oldest = [form.instance for form in formset.forms]
+    Comment.objects.create(news=news, author=author, text='Новый отзыв')
+    data = {
+        'title': news.title, 'text': news.text,
+        'date': news.date.strftime('%d.%m.%Y'),
+        'comment_set-TOTAL_FORMS': 2, 'comment_set-INITIAL_FORMS': 2,
+        'comment_set-0-DELETE': 'on',
+    }
+    for index, comment in enumerate((newest, oldest)):
+        data.update({
+            f'comment_set-{index}-id': comment.pk,
+            f'comment_set-{index}-news': news.pk,
+            f'comment_set-{index}-author': author.pk,
+            f'comment_set-{index}-text': f'Правка {index}',
+        })
+    response = admin_client.post(url, data)
+    assert response.status_code == HTTPStatus.FOUND
+    assert not Comment.objects.filter(pk=newest.pk).exists()
+    oldest.refresh_from_db()
+    assert oldest.text == 'Правка 1'
+    assert Comment.objects.filter(news=news).count() == 3
+
+
+def test_admin_news_changelist(admin_client, news_list, comment,
+                               django_assert_max_num_queries):
+    """Тест список новостей в админке не считает комментарии запросами."""
+    url = reverse('admin:news_news_changelist')
+    with django_assert_max_num_queries(8):
+        response = admin_client.get(url, {'date__gte': '2000-01-01'})
+    assert response.status_code == HTTPStatus.OK
+    assert f'<td class="field-comments_count">{1}</td>' in (
+        response.content.decode()
+    )
+    response = admin_client.get(
+        reverse('admin:news_comment_changelist'),
+        {'news__id__exact': comment.news_id},
+    )
+    assert list(response.context['cl'].result_list) == [comment]
@@ -1,14 +1,34 @@
+import threading
+import time
 from http import HTTPStatus
+from unittest import mock
 
 import pytest
+from asgiref.sync import async_to_sync
+from django.core.management import call_command
+from django.core.management.base import SystemCheckError
+from django.db import connection, connections
+from django.test.utils import CaptureQueriesContext
+from django.test import Client
 from django.urls import reverse
 from pytest_django.asserts import assertFormError
 
+from common import login
+from common.authcache import user_key
 from news.forms import BAD_WORDS, WARNING
-from news.models import Comment
+from news.models import Comment, News
+from yanews.replicas import PIN_COOKIE
 
 pytestmark = pytest.mark.django_db
 
+# Вместе с записью в поисковый индекс: вставка, замена или удаление,
+# а при создании и удалении ещё и со счётчиком комментариев новости.
+WRITE_ENDPOINTS_QUERIES = (
+    ('news_detail_url', {'text': 'Новый комментарий'}, 6),
+    ('comment_edit_url', {'text': 'Обновлённый комментарий'}, 6),
+    ('comment_delete_url', {}, 6),
+)
+
 
 def test_authorized_user_can_create_comment(news_detail_url, author_client,
                                             author):
@@ -94,3 +114,281 @@ def test_user_cant_use_bad_words(news_detail_url, not_author_client):
     form = response.context['form']
     assertFormError(form=form, field='text', errors=WARNING)
     assert Comment.objects.count() == 0
+
+
+@pytest.mark.parametrize(
+    'text', ('Ты РЕДИСКА!', 'Ну и негодяй, ёлки', 'Рёдиска')
+)
+def test_bad_words_ignore_case_and_yo(news_detail_url, author_client, text):
+    """Тест запрещённые слова ловятся без учёта регистра и буквы «ё»."""
+    response = author_client.post(news_detail_url, data={'text': text})
+    assertFormError(form=response.context['form'], field='text',
+                    errors=WARNING)
+    assert Comment.objects.count() == 0
+
+
+def test_bad_words_reload_from_file(
+        news_detail_url, author_client, settings, tmp_path):
+    """Тест список слов из файла подхватывается без перезапуска."""
+    words_file = tmp_path / 'bad_words.txt'
+    words_file.write_text('бяка\n', encoding='utf-8')
+    settings.BAD_WORDS_FILE = words_file
+    response = author_client.post(news_detail_url, data={'text': 'Бяка!'})
+    assertFormError(form=response.context['form'], field='text',
+                    errors=WARNING)
+    words_file.write_text('злюка\nвреднюга\n', encoding='utf-8')
+    response = author_client.post(news_detail_url, data={'text': 'Бяка!'})
+    assert response.status_code == HTTPStatus.FOUND
+    response = author_client.post(news_detail_url, data={'text': 'Злюка!'})
+    assertFormError(form=response.context['form'], field='text',
+                    errors=WARNING)
+    assert Comment.objects.count() == 1
+
+
+@pytest.mark.parametrize('url_fixture, form_data, queries',
+                         WRITE_ENDPOINTS_QUERIES)
+def test_write_endpoints_query_count(request, author_client, url_to_comments,
+                                     url_fixture, form_data, queries,
+                                     django_assert_num_queries):
+    """Тест запись не перечитывает уже загруженные объекты."""
+    url = request.getfixturevalue(url_fixture)
+    with django_assert_num_queries(queries):
+        response = author_client.post(url, data=form_data)
+    assert response.status_code == HTTPStatus.FOUND
+    assert response.url == url_to_comments
+
+
+def test_write_behind_comment_skips_database(
+        news_detail_url, author_client, comment_spool,
+        django_assert_num_queries):
+    """Тест при отложенной записи комментарий уходит в очередь, а не в БД."""
+    # Сессия, пользователь и новость.
+    with django_assert_num_queries(3):
+        response = author_client.post(
+            news_detail_url, data={'text': 'В очередь'}
+        )
+    assert response.status_code == HTTPStatus.FOUND
+    assert Comment.objects.count() == 0
+    assert len(comment_spool) == 1
+
+
+def test_write_behind_comment_shown_to_author(
+        news_detail_url, author_client, not_author_client, comment_spool):
+    """Тест автор сразу видит свой комментарий, остальные — после записи."""
+    etag = author_client.get(news_detail_url).headers['ETag']
+    author_client.post(news_detail_url, data={'text': 'В очередь'})
+    response = author_client.get(
+        news_detail_url, HTTP_IF_NONE_MATCH=etag
+    )
+    assert response.status_code == HTTPStatus.OK
+    assert [comment.text for comment in response.context[
+        'pending_comments']] == ['В очередь']
+    assert 'ожидает публикации' in response.content.decode()
+    response = not_author_client.get(news_detail_url)
+    assert response.context['pending_comments'] == []
+
+
+def test_search_index_follows_comments(author_client, comment, search_url,
+                                       comment_edit_url, comment_delete_url):
+    """Тест правка и удаление комментария сразу видны в поиске."""
+    def found(query):
+        return author_client.get(search_url, {'q': query}).context[
+            'object_list']
+
+    assert found('комментарием') == [comment.news]
+    author_client.post(comment_edit_url, data={'text': 'Переписали'})
+    assert found('комментарий') == []
+    assert found('переписать') == [comment.news]
+    author_client.post(comment_delete_url)
+    assert found('переписать') == []
+
+
+def test_sqlite_profile_concurrent_access(tmp_path):
+    """Тест читатель не ждёт писателя, а второй писатель ждёт первого."""
+    connections = [connection.copy() for _ in range(2)]
+    for db in connections:
+        db.settings_dict['NAME'] = str(tmp_path / 'db.sqlite3')
+    writer, other = connections
+    try:
+        with writer.cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            assert cursor.fetchone()[0] == 'wal'
+            cursor.execute('CREATE TABLE item (value INTEGER)')
+            cursor.execute('BEGIN IMMEDIATE')
+            cursor.execute('INSERT INTO item VALUES (1)')
+        timer = threading.Timer(0.2, writer.connection.commit)
+        timer.start()
+        with other.cursor() as cursor:
+            cursor.execute('SELECT COUNT(*) FROM item')
+            assert cursor.fetchone()[0] == 0
+            started = time.monotonic()
+            cursor.execute('INSERT INTO item VALUES (2)')
+            assert time.monotonic() - started > 0.1
+            cursor.execute('SELECT COUNT(*) FROM item')
+            assert cursor.fetchone()[0] == 2
+        timer.join()
+    finally:
+        for db in connections:
+            db.close()
+
+
+# Реплика в тестах — второе соединение к той же БД: данные ему видны
+# только после фиксации, поэтому тесты идут без общей транзакции.
+@pytest.mark.django_db(transaction=True, databases=['default', 'replica'])
+@pytest.mark.usefixtures('replica')
+def test_reads_pinned_to_primary_after_write(
+        author_client, home_url, news_detail_url, comment_edit_url):
+    """Тест после записи пользователь какое-то время читает основную БД."""
+    def databases_used(url):
+        with CaptureQueriesContext(connections['replica']) as replica:
+            with CaptureQueriesContext(connections['default']) as default:
+                author_client.get(url)
+        return bool(replica.captured_queries), bool(
+            default.captured_queries
+        )
+
+    assert databases_used(home_url) == (True, True)
+    # Правка комментария всегда читает основную БД.
+    assert databases_used(comment_edit_url) == (False, True)
+    response = author_client.post(
+        news_detail_url, data={'text': 'Новый комментарий'}
+    )
+    assert response.cookies[PIN_COOKIE]['max-age'] == 10
+    assert databases_used(news_detail_url) == (False, True)
+
+
+@pytest.mark.django_db(transaction=True, databases=['default', 'replica'])
+@pytest.mark.usefixtures('replica')
+def test_session_and_user_read_from_primary(settings, author_client, comment,
+                                            news_detail_url):
+    """Тест сессия и пользователь читаются из основной БД при любом порядке."""
+    settings.MIDDLEWARE = [
+        name for name in settings.MIDDLEWARE
+        if name != 'common.querybudget.QueryBudgetMiddleware'
+    ]
+    with CaptureQueriesContext(connections['replica']) as replica:
+        response = author_client.get(news_detail_url)
+    assert reverse('news:edit', args=(comment.id,)) in (
+        response.content.decode()
+    )
+    assert replica.captured_queries
+    assert not [
+        query for query in replica.captured_queries
+        if 'FROM "django_session"' in query['sql']
+        or 'FROM "auth_user"' in query['sql']
+    ]
+
+
+def test_comments_count_interleaved_writes(news, author, not_author):
+    """Тест счётчик не теряет записей, сделанных поверх устаревших данных."""
+    stale = News.objects.get(pk=news.pk)
+    other = News.objects.get(pk=news.pk)
+    Comment.objects.create(news=stale, author=author, text='Первый')
+    Comment.objects.create(news=other, author=not_author, text='Второй')
+    stale.title = 'Новый заголовок'
+    stale.save()
+    Comment.objects.bulk_create(
+        Comment(news=news, author=author, text='Пачкой') for _ in range(3)
+    )
+    Comment.objects.filter(text='Пачкой')[:1].get().delete()
+    Comment.objects.filter(text='Первый').delete()
+    news.refresh_from_db()
+    assert news.title == 'Новый заголовок'
+    assert news.comments_count == news.comment_set.count() == 3
+    news.delete()
+    assert Comment.objects.count() == 0
+
+
+def test_excerpt_follows_text(news):
+    """Тест анонс пересчитывается при любом сохранении текста."""
+    assert news.excerpt == 'Текст новости'
+    news.text = ' '.join(['слово'] * 20)
+    news.save(update_fields=['text'])
+    news.refresh_from_db()
+    assert news.excerpt == ' '.join(['слово'] * 15) + ' …'
+    feed_news = News.objects.defer('text').get(pk=news.pk)
+    feed_news.title = 'Новый заголовок'
+    feed_news.save()
+    news.refresh_from_db()
+    assert news.excerpt == ' '.join(['слово'] * 15) + ' …'
+
+
+def test_cached_auth(settings, author, home_url, django_assert_num_queries):
+    """Тест сессия и пользователь берутся из кеша до выхода из системы."""
+    settings.SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+    settings.AUTHENTICATION_BACKENDS = ['common.authcache.CachedModelBackend']
+    client = Client()
+    client.force_login(author)
+    client.get(home_url)
+    # Только выборка ленты: ни сессии, ни пользователя.
+    with django_assert_num_queries(1):
+        client.get(home_url)
+    key = user_key(author.pk)
+    client.post(reverse('users:logout'))
+    assert user_key(author.pk) != key
+
+
+def test_cached_auth_requires_shared_cache(settings, tmp_path):
+    """Тест с кешем авторизации и LocMemCache проект не запускается."""
+    call_command('check')
+    settings.AUTHENTICATION_BACKENDS = ['common.authcache.CachedModelBackend']
+    with pytest.raises(SystemCheckError, match='common.E001'):
+        call_command('check')
+    settings.CACHES = {'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': tmp_path,
+    }}
+    call_command('check')
+
+
+@pytest.fixture
+def cheap_hashing(settings):
+    """Дешёвая стоимость хеширования, чтобы тесты шли быстро."""
+    settings.PASSWORD_HASHING_COST = {
+        'pbkdf2': {'iterations': 1000},
+        'scrypt': {'work_factor': 2 ** 4, 'block_size': 8, 'parallelism': 1},
+        'argon2': {'time_cost': 1, 'memory_cost': 8, 'parallelism': 1},
+    }
+    return settings
+
+
+def test_password_rehashed_on_login(cheap_hashing, client, django_user_model):
+    """Тест при входе хеш пересчитывается новым алгоритмом и стоимостью."""
+    user = django_user_model.objects.create_user('Гость', password='Пароль')
+    assert user.password.startswith('pbkdf2_sha256$1000$')
+    cheap_hashing.PASSWORD_HASHERS = [
+        'common.hashers.ScryptPasswordHasher',
+        'common.hashers.PBKDF2PasswordHasher',
+    ]
+    credentials = {'username': 'Гость', 'password': 'Пароль'}
+    for work_factor in (2 ** 4, 2 ** 5):
+        cheap_hashing.PASSWORD_HASHING_COST['scrypt'][
+            'work_factor'] = work_factor
+        response = client.post(reverse('users:login'), credentials)
+        assert response.status_code == HTTPStatus.FOUND
+        user.refresh_from_db()
+        algorithm, stored_factor, *_ = user.password.split('$')
+        assert (algorithm, int(stored_factor)) == ('scrypt', work_factor)
+
+
+@pytest.mark.django_db(transaction=True)
+def test_async_login_checks_password_in_pool(cheap_hashing, asgi_client,
+                                             django_user_model):
+    """Тест асинхронный вход проверяет пароль в потоке пула хеширования."""
+    user = django_user_model.objects.create_user('Гость', password='Пароль')
+    threads = []
+    original = login.run_and_close
+
+    def run_and_close(func):
+        threads.append(threading.current_thread().name)
+        return original(func)
+
+    with mock.patch.object(login, 'run_and_close', run_and_close):
+        response = async_to_sync(asgi_client.post)(
+            reverse('users:login'),
+            {'username': 'Гость', 'password': 'Пароль'},
+        )
+    assert response.status_code == HTTPStatus.FOUND
+    assert asgi_client.session['_auth_user_id'] == str(user.pk)
+    assert len(threads) == 1
+    assert threads[0].startswith('password-hashing')
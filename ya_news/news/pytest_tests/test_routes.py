@@ -3,6 +3,8 @@ from http import HTTPStatus
 import pytest
 from django.urls import reverse
 
+from news.pagination import NEXT, encode_cursor
+
 pytestmark = pytest.mark.django_db
 
 COMMON_PAGES = [
@@ -39,6 +41,21 @@ def test_common_pages_status(request, author_client, name, arg_name, method,
     assert response.status_code == expected
 
 
+@pytest.mark.parametrize("url_name", ["home_url", "news_detail_url"])
+@pytest.mark.parametrize("cursor", [
+    "мусор", "WyJ4IiwgMV0", "WyJuIl0",
+    encode_cursor(NEXT, [[1], 1]),
+    encode_cursor(NEXT, [5, 1]),
+    encode_cursor(NEXT, [None, 1]),
+    encode_cursor(NEXT, [{"a": 1}, 1]),
+])
+def test_invalid_cursor_not_found(request, client, url_name, cursor):
+    """Тест некорректный курсор страницы приводит к 404."""
+    url = request.getfixturevalue(url_name)
+    response = client.get(url, {"cursor": cursor})
+    assert response.status_code == HTTPStatus.NOT_FOUND
+
+
 @pytest.mark.parametrize("action,arg_name,method", COMMENT_ACTIONS)
 def test_comment_action_status_author(request, author_client, action,
                                       arg_name, method):
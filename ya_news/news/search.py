@@ -0,0 +1,225 @@
+"""
+Полнотекстовый поиск по новостям и комментариям.
+
+FTS5 не умеет стеммировать русский текст, поэтому слова приводятся
+к основам стеммером Snowball ещё в Python: так индексируются и тексты,
+и запросы. Индекс хранит уже обработанные основы: новости в таблице
+news_news_fts, комментарии в news_comment_fts. Обновляют его сигналы
+моделей, заново строит команда rebuild_news_index.
+"""
+import re
+import threading
+from functools import lru_cache
+
+import snowballstemmer
+from django.db import connections
+from django.db.models import Q
+
+NEWS_FTS_TABLE = 'news_news_fts'
+COMMENT_FTS_TABLE = 'news_comment_fts'
+# Совпадение в заголовке весит больше, чем в тексте, а совпадение только
+# в комментариях поднимает новость слабее, чем совпадение в ней самой.
+TITLE_WEIGHT = 10.0
+TEXT_WEIGHT = 1.0
+COMMENT_WEIGHT = 0.5
+
+WORD = re.compile(r'\w+')
+
+RESULTS_SQL = f"""
+    SELECT news_id, MIN(rank) AS rank FROM (
+        SELECT rowid AS news_id,
+               bm25({NEWS_FTS_TABLE}, {TITLE_WEIGHT}, {TEXT_WEIGHT}) AS rank
+        FROM {NEWS_FTS_TABLE} WHERE {NEWS_FTS_TABLE} MATCH %s
+        UNION ALL
+        SELECT news_id, bm25({COMMENT_FTS_TABLE}) * {COMMENT_WEIGHT}
+        FROM {COMMENT_FTS_TABLE} WHERE {COMMENT_FTS_TABLE} MATCH %s
+    ) GROUP BY news_id
+"""
+PAGE_SQL = f'{RESULTS_SQL} ORDER BY rank, news_id DESC LIMIT %s OFFSET %s'
+COUNT_SQL = f'SELECT COUNT(*) FROM ({RESULTS_SQL})'
+
+# Объекты стеммера хранят состояние разбора, поэтому у каждого потока свой.
+_local = threading.local()
+
+
+@lru_cache(maxsize=100_000)
+def stem(word):
+    """
+    Основа слова.
+
+    Стеммер на чистом Python медленный, а слова в текстах повторяются,
+    поэтому основы частых слов запоминаем.
+    """
+    stemmer = getattr(_local, 'stemmer', None)
+    if stemmer is None:
+        stemmer = _local.stemmer = snowballstemmer.stemmer('russian')
+    return stemmer.stemWord(word)
+
+
+def stem_words(text):
+    """Основы слов текста в нижнем регистре."""
+    return [stem(word) for word in WORD.findall(text.casefold())]
+
+
+def index_text(text):
+    """Текст в том виде, в каком он попадает в индекс."""
+    return ' '.join(stem_words(text))
+
+
+def match_expression(query):
+    """
+    Запрос FTS5 по основам слов или None, если искать нечего.
+
+    Основы берутся в кавычки, чтобы ввод не исполнялся как синтаксис
+    FTS5. Последняя ищется как префикс: слово может быть недописано.
+    """
+    words = stem_words(query)
+    if not words:
+        return None
+    terms = [f'"{word}"' for word in words]
+    terms[-1] += '*'
+    return ' '.join(terms)
+
+
+def supports_index(using):
+    return connections[using].vendor == 'sqlite'
+
+
+def index_news(news, using='default', created=False):
+    if not supports_index(using):
+        return
+    with connections[using].cursor() as cursor:
+        if not created:
+            cursor.execute(
+                f'DELETE FROM {NEWS_FTS_TABLE} WHERE rowid = %s',
+                [news.pk],
+            )
+        cursor.execute(
+            f'INSERT INTO {NEWS_FTS_TABLE}(rowid, title, text) '
+            f'VALUES (%s, %s, %s)',
+            [news.pk, index_text(news.title), index_text(news.text)],
+        )
+
+
+def index_comment(comment, using='default', created=False):
+    if not supports_index(using):
+        return
+    with connections[using].cursor() as cursor:
+        if not created:
+            cursor.execute(
+                f'DELETE FROM {COMMENT_FTS_TABLE} WHERE rowid = %s',
+                [comment.pk],
+            )
+        cursor.execute(
+            f'INSERT INTO {COMMENT_FTS_TABLE}(rowid, text, news_id) '
+            f'VALUES (%s, %s, %s)',
+            [comment.pk, index_text(comment.text), comment.news_id],
+        )
+
+
+def index_comments(comments, using='default'):
+    """Добавляет в индекс новые комментарии одним executemany."""
+    if not supports_index(using):
+        return
+    with connections[using].cursor() as cursor:
+        cursor.executemany(
+            f'INSERT INTO {COMMENT_FTS_TABLE}(rowid, text, news_id) '
+            f'VALUES (%s, %s, %s)',
+            [
+                (comment.pk, index_text(comment.text), comment.news_id)
+                for comment in comments
+            ],
+        )
+
+
+def unindex(table, pk, using='default'):
+    if not supports_index(using):
+        return
+    with connections[using].cursor() as cursor:
+        cursor.execute(f'DELETE FROM {table} WHERE rowid = %s', [pk])
+
+
+def rebuild_index(news_rows, comment_rows, using='default', batch_size=1000):
+    """
+    Заполняет индекс заново.
+
+    news_rows и comment_rows — итерируемые кортежи (id, title, text)
+    и (id, text, news_id); пишем их пачками по batch_size строк.
+    """
+    with connections[using].cursor() as cursor:
+        for table, rows, columns, stemmed in (
+            (NEWS_FTS_TABLE, news_rows, 'rowid, title, text', (1, 2)),
+            (COMMENT_FTS_TABLE, comment_rows, 'rowid, text, news_id', (1,)),
+        ):
+            cursor.execute(f'DELETE FROM {table}')
+            sql = f'INSERT INTO {table}({columns}) VALUES (%s, %s, %s)'
+            batch = []
+            for row in rows:
+                batch.append([
+                    index_text(value) if position in stemmed else value
+                    for position, value in enumerate(row)
+                ])
+                if len(batch) == batch_size:
+                    cursor.executemany(sql, batch)
+                    batch = []
+            if batch:
+                cursor.executemany(sql, batch)
+            cursor.execute(
+                f"INSERT INTO {table}({table}) VALUES('optimize')"
+            )
+
+
+def search(queryset, query):
+    """
+    Новости из queryset, подходящие под запрос, от лучших к худшим.
+
+    Без SQLite индекса нет: ищем через icontains по новостям
+    и комментариям и выводим от новых к старым.
+    """
+    if not supports_index(queryset.db):
+        if not query.strip():
+            return queryset.none()
+        return queryset.filter(
+            Q(title__icontains=query)
+            | Q(text__icontains=query)
+            | Q(comment__text__icontains=query)
+        ).distinct().order_by('-date', '-id')
+    return SearchResults(queryset, query)
+
+
+class SearchResults:
+    """
+    Выдача поиска для Paginator: новости от лучших совпадений к худшим.
+
+    Считает и режет выдачу в SQL, а из таблицы новостей загружает только
+    записи запрошенной страницы.
+    """
+
+    def __init__(self, queryset, query):
+        self.queryset = queryset
+        self.expression = match_expression(query)
+
+    def _execute(self, sql, params):
+        with connections[self.queryset.db].cursor() as cursor:
+            cursor.execute(sql, [self.expression, self.expression, *params])
+            return cursor.fetchall()
+
+    def count(self):
+        if self.expression is None:
+            return 0
+        return self._execute(COUNT_SQL, [])[0][0]
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        start = index.start or 0
+        if self.expression is None or index.stop <= start:
+            return []
+        ids = [news_id for news_id, _ in self._execute(
+            PAGE_SQL, [index.stop - start, start]
+        )]
+        found = self.queryset.in_bulk(ids)
+        return [found[news_id] for news_id in ids if news_id in found]
@@ -0,0 +1,93 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .cache import bump_feed_version, bump_news_version
+from .excerpts import make_excerpt
+from .models import Comment, News
+from .search import (
+    COMMENT_FTS_TABLE, NEWS_FTS_TABLE, index_comment, index_news, unindex
+)
+
+
+def news_changed(news_id):
+    bump_news_version(news_id)
+    bump_feed_version()
+
+
+def news_batch_changed(news_ids):
+    """Сбрасывает кеши сразу нескольких новостей и ленту один раз."""
+    for news_id in news_ids:
+        bump_news_version(news_id)
+    bump_feed_version()
+
+
+@receiver(pre_save, sender=News)
+def fill_excerpt(sender, instance, update_fields, **kwargs):
+    """
+    Анонс считается при каждом сохранении текста.
+
+    Сигнал приходит и при loaddata (raw=True), когда save не вызывается.
+    """
+    if 'text' in instance.get_deferred_fields():
+        return
+    if update_fields is None or 'text' in update_fields:
+        instance.excerpt = make_excerpt(instance.text)
+
+
+@receiver((post_save, post_delete), sender=News)
+def news_written(sender, instance, **kwargs):
+    """Сбрасываем кеш и валидаторы новости после фиксации транзакции."""
+    transaction.on_commit(partial(news_changed, instance.pk))
+
+
+@receiver(post_save, sender=Comment)
+def count_created_comment(sender, instance, created, using, **kwargs):
+    if created:
+        News.objects.using(using).add_comments({instance.news_id: 1})
+
+
+@receiver(post_delete, sender=Comment)
+def count_deleted_comment(sender, instance, using, origin, **kwargs):
+    """Если удаляют саму новость, её счётчик уже не нужен."""
+    if not (
+        isinstance(origin, News) or getattr(origin, 'model', None) is News
+    ):
+        News.objects.using(using).add_comments({instance.news_id: -1})
+
+
+@receiver((post_save, post_delete), sender=Comment)
+def comments_changed(sender, instance, **kwargs):
+    """Сбрасываем кеш комментариев новости после фиксации транзакции."""
+    transaction.on_commit(partial(news_changed, instance.news_id))
+
+
+def indexed_fields_changed(update_fields, fields):
+    return update_fields is None or not fields.isdisjoint(update_fields)
+
+
+@receiver(post_save, sender=News)
+def index_saved_news(sender, instance, created, using, update_fields,
+                     **kwargs):
+    """Индекс обновляется в той же транзакции, что и новость."""
+    if indexed_fields_changed(update_fields, {'title', 'text'}):
+        index_news(instance, using, created)
+
+
+@receiver(post_delete, sender=News)
+def unindex_deleted_news(sender, instance, using, **kwargs):
+    unindex(NEWS_FTS_TABLE, instance.pk, using)
+
+
+@receiver(post_save, sender=Comment)
+def index_saved_comment(sender, instance, created, using, update_fields,
+                        **kwargs):
+    if indexed_fields_changed(update_fields, {'text', 'news'}):
+        index_comment(instance, using, created)
+
+
+@receiver(post_delete, sender=Comment)
+def unindex_deleted_comment(sender, instance, using, **kwargs):
+    unindex(COMMENT_FTS_TABLE, instance.pk, using)
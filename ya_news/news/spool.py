@@ -0,0 +1,180 @@
+"""
+Очередь комментариев для отложенной записи в БД.
+
+При COMMENTS_WRITE_BEHIND форма комментария не пишет в основную БД,
+а кладёт комментарий в очередь — отдельный файл SQLite, запись в который
+не конкурирует за блокировку основной БД. Команда drain_comments
+переносит очередь в БД пачками через bulk_create и сбрасывает кеши один
+раз на пачку. Пока комментарий в очереди, автор видит его на странице
+новости как ожидающий публикации.
+
+Доставка «хотя бы один раз»: если процесс упадёт между фиксацией пачки
+в БД и удалением её из очереди, пачка будет записана повторно.
+Комментарии к удалённым новостям или от удалённых пользователей
+переносятся в таблицу dead того же файла, чтобы не блокировать очередь.
+"""
+import sqlite3
+import threading
+from collections import namedtuple
+from datetime import datetime
+from functools import lru_cache, partial
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Comment, News
+from .search import index_comments
+from .signals import news_batch_changed
+
+PendingComment = namedtuple(
+    'PendingComment', ('pk', 'news_id', 'author_id', 'text', 'created')
+)
+
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS spool ('
+    'id INTEGER PRIMARY KEY AUTOINCREMENT, news_id INTEGER NOT NULL, '
+    'author_id INTEGER NOT NULL, text TEXT NOT NULL, created TEXT NOT NULL)',
+    'CREATE INDEX IF NOT EXISTS spool_news_author '
+    'ON spool (news_id, author_id, id)',
+    'CREATE TABLE IF NOT EXISTS dead ('
+    'id INTEGER PRIMARY KEY, news_id INTEGER NOT NULL, '
+    'author_id INTEGER NOT NULL, text TEXT NOT NULL, created TEXT NOT NULL)',
+)
+
+
+class CommentSpool:
+    """Очередь комментариев в файле SQLite; соединение у каждого потока."""
+
+    def __init__(self, path):
+        self.path = str(path)
+        self.local = threading.local()
+
+    @property
+    def connection(self):
+        connection = getattr(self.local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(
+                self.path, timeout=5, isolation_level=None
+            )
+            connection.execute('PRAGMA journal_mode = WAL')
+            connection.execute('PRAGMA synchronous = NORMAL')
+            for sql in SCHEMA:
+                connection.execute(sql)
+            self.local.connection = connection
+        return connection
+
+    def put(self, news_id, author_id, text):
+        self.connection.execute(
+            'INSERT INTO spool (news_id, author_id, text, created) '
+            'VALUES (?, ?, ?, ?)',
+            (news_id, author_id, text, timezone.now().isoformat()),
+        )
+
+    def select(self, where, params):
+        return self.select_from('spool', where, params)
+
+    def select_from(self, table, where, params):
+        return [
+            PendingComment(*row[:4], datetime.fromisoformat(row[4]))
+            for row in self.connection.execute(
+                f'SELECT id, news_id, author_id, text, created FROM {table} '
+                f'{where}', params,
+            )
+        ]
+
+    def pending(self, news_id, author_id):
+        """Комментарии автора к новости, ещё не перенесённые в БД."""
+        return self.select(
+            'WHERE news_id = ? AND author_id = ? ORDER BY id',
+            (news_id, author_id),
+        )
+
+    def take(self, limit):
+        """Первые limit комментариев очереди; из очереди не удаляются."""
+        return self.select('ORDER BY id LIMIT ?', (limit,))
+
+    def remove(self, comments):
+        self.connection.execute('BEGIN')
+        self.connection.executemany(
+            'DELETE FROM spool WHERE id = ?',
+            [(comment.pk,) for comment in comments],
+        )
+        self.connection.execute('COMMIT')
+
+    def bury(self, comments):
+        """Переносит комментарии, которые нельзя записать, в таблицу dead."""
+        self.connection.execute('BEGIN')
+        self.connection.executemany(
+            'INSERT OR REPLACE INTO dead (id, news_id, author_id, text, '
+            'created) VALUES (?, ?, ?, ?, ?)',
+            [
+                (*comment[:4], comment.created.isoformat())
+                for comment in comments
+            ],
+        )
+        self.connection.executemany(
+            'DELETE FROM spool WHERE id = ?',
+            [(comment.pk,) for comment in comments],
+        )
+        self.connection.execute('COMMIT')
+
+    def dead(self):
+        """Комментарии, отложенные из-за удалённой новости или автора."""
+        return self.select_from('dead', 'ORDER BY id', ())
+
+    def __len__(self):
+        return self.connection.execute(
+            'SELECT COUNT(*) FROM spool'
+        ).fetchone()[0]
+
+
+@lru_cache
+def spool_at(path):
+    return CommentSpool(path)
+
+
+def get_spool():
+    return spool_at(str(settings.COMMENTS_SPOOL_PATH))
+
+
+def drain(spool, batch_size):
+    """
+    Переносит в БД одну пачку комментариев из очереди.
+
+    bulk_create не отправляет сигналов, поэтому поисковый индекс
+    пополняется здесь же, а версии кеша новостей и ленты сбрасываются
+    один раз на пачку после фиксации. Время комментария — время его
+    отправки. Комментарии к удалённым новостям и от удалённых
+    пользователей уходят в dead. Возвращает число разобранных строк.
+    """
+    taken = spool.take(batch_size)
+    if not taken:
+        return 0
+    news_ids = set(News.objects.filter(
+        pk__in={comment.news_id for comment in taken}
+    ).values_list('pk', flat=True))
+    author_ids = set(get_user_model().objects.filter(
+        pk__in={comment.author_id for comment in taken}
+    ).values_list('pk', flat=True))
+    pending = [
+        comment for comment in taken
+        if comment.news_id in news_ids and comment.author_id in author_ids
+    ]
+    if len(pending) < len(taken):
+        spool.bury([comment for comment in taken if comment not in pending])
+    if not pending:
+        return len(taken)
+    with transaction.atomic():
+        comments = Comment.objects.bulk_create(
+            Comment(news_id=comment.news_id, author_id=comment.author_id,
+                    text=comment.text, created=comment.created)
+            for comment in pending
+        )
+        index_comments(comments)
+        transaction.on_commit(partial(
+            news_batch_changed, {comment.news_id for comment in pending}
+        ))
+    spool.remove(pending)
+    return len(taken)
@@ -1,38 +1,183 @@
+import hashlib
+from collections import namedtuple
+
 from django.conf import settings
 from django.contrib.auth.mixins import LoginRequiredMixin
+from django.core.cache import cache
 from django.shortcuts import get_object_or_404
+from django.template.loader import render_to_string
 from django.urls import reverse
+from django.utils.decorators import method_decorator
 from django.views import generic
+from django.views.decorators.http import condition
+
+from yanews.replicas import reading_replica
 
+from .cache import comments_page_key, get_feed_version, get_news_version
 from .forms import CommentForm
 from .models import Comment, News
+from .pagination import KeysetPaginator
+from .search import search
+from .spool import get_spool
+
+CommentsPage = namedtuple('CommentsPage', (
+    'comments', 'has_previous', 'previous_cursor', 'has_next', 'next_cursor'
+))
+RenderedComment = namedtuple('RenderedComment', ('pk', 'author_id', 'html'))
+
+
+def make_etag(request, version, user=None):
+    """
+    Строит ETag страницы для конкретного пользователя.
+
+    В шапке и ссылках на комментарии страница зависит от пользователя,
+    поэтому его id входит в ETag вместе с версией данных и параметрами.
+    """
+    if user is None:
+        user = request.user
+    return hashlib.md5(
+        f'{user.pk}:{request.GET.urlencode()}:{version}'.encode()
+    ).hexdigest()
+
+
+def render_comments_page(page):
+    """Готовит страницу комментариев к кешированию: без данных о зрителе."""
+    return CommentsPage(
+        comments=[
+            RenderedComment(
+                comment.pk,
+                comment.author_id,
+                render_to_string(
+                    'includes/comment.html', {'comment': comment}
+                ),
+            )
+            for comment in page.items
+        ],
+        has_previous=page.has_previous,
+        previous_cursor=page.previous_cursor,
+        has_next=page.has_next,
+        next_cursor=page.next_cursor,
+    )
+
+
+def pending_comments(news_id, user):
+    """Комментарии пользователя к новости, ещё ждущие записи в БД."""
+    if not (settings.COMMENTS_WRITE_BEHIND and user.is_authenticated):
+        return []
+    return get_spool().pending(news_id, user.pk)
+
 
+def with_pending(version, pending):
+    """Версия страницы с учётом комментариев автора в очереди."""
+    return f'{version}:{pending[-1].pk}' if pending else version
 
+
+def feed_etag(request, *args, **kwargs):
+    if reading_replica():
+        return None
+    return make_etag(request, get_feed_version())
+
+
+def news_etag(request, pk, *args, **kwargs):
+    # Отстающая реплика отдаст старые данные, а версия уже новая: такой
+    # ETag закрепил бы у клиента устаревшую страницу.
+    if reading_replica():
+        return None
+    return make_etag(request, with_pending(
+        get_news_version(pk), pending_comments(pk, request.user)
+    ))
+
+
+@method_decorator(condition(etag_func=feed_etag), name='dispatch')
 class NewsList(generic.ListView):
     """Список новостей."""
     model = News
+    replica_reads = True
     template_name = 'news/home.html'
+    ordering = ('-date', '-id')
 
     def get_queryset(self):
+        """Ленте хватает анонса, полный текст не загружаем."""
+        return super().get_queryset().defer('text')
+
+    def get_context_data(self, **kwargs):
         """
-        Выводим только несколько последних новостей.
+        Выводим страницу из нескольких новостей, от новых к старым.
 
-        Их количество определяется в настройках проекта.
+        Их количество определяется в настройках проекта, соседние
+        страницы открываются по курсору из параметра cursor.
         """
-        return self.model.objects.prefetch_related(
-            'comment_set'
-        )[:settings.NEWS_COUNT_ON_HOME_PAGE]
+        page = KeysetPaginator(
+            self.object_list,
+            self.ordering,
+            settings.NEWS_COUNT_ON_HOME_PAGE,
+        ).get_page(self.request.GET.get('cursor'))
+        return super().get_context_data(
+            object_list=page.object_list, page_obj=page, **kwargs
+        )
+
 
+@method_decorator(condition(etag_func=feed_etag), name='dispatch')
+class NewsSearch(generic.ListView):
+    """Поиск по новостям и комментариям к ним."""
+    template_name = 'news/search.html'
+    paginate_by = settings.NEWS_SEARCH_PAGE_SIZE
 
-class NewsDetail(generic.DetailView):
+    def get_queryset(self):
+        return search(
+            News.objects.defer('text'), self.request.GET.get('q', '')
+        )
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['query'] = self.request.GET.get('q', '')
+        return context
+
+
+class CommentsPageMixin:
+    """
+    Добавляет в контекст страницу комментариев к новости.
+
+    Отрендеренные комментарии кешируются по версии, которую сбрасывают
+    сигналы модели Comment. Ссылки на редактирование и удаление зависят
+    от пользователя и рисуются в шаблоне поверх кеша. Страницу, прочитанную
+    с реплики, в кеш не кладём: реплика может отставать от версии.
+    """
+    comments_ordering = ('created', 'id')
+
+    def get_comments_page(self):
+        cursor = self.request.GET.get('cursor')
+        key = comments_page_key(self.object.pk, cursor)
+        comments_page = cache.get(key)
+        if comments_page is None:
+            page = KeysetPaginator(
+                self.object.comment_set.select_related('author'),
+                self.comments_ordering,
+                settings.COMMENTS_COUNT_ON_NEWS_PAGE,
+            ).get_page(cursor)
+            comments_page = render_comments_page(page)
+            if not reading_replica():
+                cache.set(
+                    key, comments_page, settings.COMMENTS_CACHE_TIMEOUT
+                )
+        return comments_page
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['comments_page'] = self.get_comments_page()
+        context['pending_comments'] = pending_comments(
+            self.object.pk, self.request.user
+        )
+        return context
+
+
+@method_decorator(condition(etag_func=news_etag), name='dispatch')
+class NewsDetail(CommentsPageMixin, generic.DetailView):
     model = News
     template_name = 'news/detail.html'
 
     def get_object(self, queryset=None):
-        obj = get_object_or_404(
-            self.model.objects.prefetch_related('comment_set__author'),
-            pk=self.kwargs['pk']
-        )
+        obj = get_object_or_404(self.model, pk=self.kwargs['pk'])
         return obj
 
     def get_context_data(self, **kwargs):
@@ -44,6 +189,7 @@ class NewsDetail(generic.DetailView):
 
 class NewsComment(
         LoginRequiredMixin,
+        CommentsPageMixin,
         generic.detail.SingleObjectMixin,
         generic.FormView
 ):
@@ -56,6 +202,18 @@ class NewsComment(
         return super().post(request, *args, **kwargs)
 
     def form_valid(self, form):
+        """
+        При COMMENTS_WRITE_BEHIND комментарий уходит в очередь.
+
+        В БД его перенесёт команда drain_comments, а до тех пор автор
+        видит его на странице новости как ожидающий публикации.
+        """
+        if settings.COMMENTS_WRITE_BEHIND:
+            get_spool().put(
+                self.object.pk, self.request.user.pk,
+                form.cleaned_data['text'],
+            )
+            return super().form_valid(form)
         comment = form.save(commit=False)
         comment.news = self.object
         comment.author = self.request.user
@@ -63,11 +221,13 @@ class NewsComment(
         return super().form_valid(form)
 
     def get_success_url(self):
-        post = self.get_object()
-        return reverse('news:detail', kwargs={'pk': post.pk}) + '#comments'
+        return reverse(
+            'news:detail', kwargs={'pk': self.object.pk}
+        ) + '#comments'
 
 
 class NewsDetailView(generic.View):
+    replica_reads = True
 
     def get(self, request, *args, **kwargs):
         view = NewsDetail.as_view()
@@ -83,9 +243,9 @@ class CommentBase(LoginRequiredMixin):
     model = Comment
 
     def get_success_url(self):
-        comment = self.get_object()
+        """Комментарий уже загружен, а для адреса хватит news_id."""
         return reverse(
-            'news:detail', kwargs={'pk': comment.news.pk}
+            'news:detail', kwargs={'pk': self.object.news_id}
         ) + '#comments'
 
     def get_queryset(self):
@@ -0,0 +1,95 @@
+"""
+Чтение новостей с реплик БД.
+
+Реплики перечисляются в настройке DATABASE_REPLICAS. Читать с них
+разрешено только представлениям с атрибутом replica_reads = True и
+только на GET и HEAD: всё остальное, включая сессии, пользователей
+и CommentUpdate/CommentDelete, идёт в основную БД. После записи
+пользователь на REPLICA_PIN_SECONDS закрепляется за основной БД cookie,
+чтобы сразу видеть свой комментарий, даже если реплика отстаёт.
+
+Реплика может отставать и от версий в кеше: прочитанное с неё нельзя
+класть в кеш под текущей версией и отдавать с ETag, см. reading_replica.
+"""
+import random
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+PIN_COOKIE = 'read_primary'
+
+# Сессии и пользователи всегда читаются из основной БД: иначе только что
+# вошедший пользователь на отстающей реплике выглядел бы вышедшим.
+PRIMARY_APPS = frozenset({'sessions', 'auth'})
+
+read_from_replica = ContextVar('read_from_replica', default=False)
+
+
+def reading_replica():
+    """Читает ли текущий запрос с реплики."""
+    return bool(settings.DATABASE_REPLICAS and read_from_replica.get())
+
+
+class ReplicaRouter:
+    """Чтение в режиме реплики — со случайной реплики, запись — в основную."""
+
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label not in PRIMARY_APPS and reading_replica():
+            return random.choice(settings.DATABASE_REPLICAS)
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # На репликах те же данные, что и в основной БД.
+        return True
+
+
+class ReplicaMiddleware:
+    """Включает чтение с реплик для помеченных представлений."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self.finish(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self.finish(request, await self.get_response(request))
+
+    def finish(self, request, response):
+        # В асинхронном режиме process_view выполняется через sync_to_async
+        # в копии контекста, поэтому токен сбросить нельзя: просто снимаем
+        # флаг, чтобы он не достался следующему запросу в этом потоке.
+        if getattr(request, 'replica_reads', False):
+            read_from_replica.set(False)
+        if (
+            settings.DATABASE_REPLICAS
+            and request.method not in ('GET', 'HEAD')
+            and response.status_code < 400
+        ):
+            response.set_cookie(
+                PIN_COOKIE, '1', max_age=settings.REPLICA_PIN_SECONDS,
+                httponly=True, samesite='Lax',
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        view_class = getattr(view_func, 'view_class', None)
+        if (
+            getattr(view_class, 'replica_reads', False)
+            and request.method in ('GET', 'HEAD')
+            and PIN_COOKIE not in request.COOKIES
+        ):
+            request.replica_reads = True
+            read_from_replica.set(True)
@@ -1,9 +1,14 @@
+import sys
 from pathlib import Path
 
 from django.urls import reverse_lazy
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 
+# Общий для проектов пакет common лежит в корне репозитория.
+if str(BASE_DIR.parent) not in sys.path:
+    sys.path.append(str(BASE_DIR.parent))
+
 SECRET_KEY = 'django-insecure-7)dgs++2!#==aye4rd=5)c)bw0eokiyqx0hts6#t80!$c&$s+('
 
 DEBUG = True
@@ -26,18 +31,29 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'common.querybudget.QueryBudgetMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'yanews.replicas.ReplicaMiddleware',
 ]
 
 ROOT_URLCONF = 'yanews.urls'
 
+# Кешированный загрузчик читает и разбирает каждый шаблон один раз
+# за жизнь процесса; при DEBUG его кеш сбрасывает автоперезагрузка.
+TEMPLATE_LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [BASE_DIR / 'templates'],
-        'APP_DIRS': True,
         'OPTIONS': {
+            'loaders': [
+                ('django.template.loaders.cached.Loader', TEMPLATE_LOADERS),
+            ],
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
@@ -48,17 +64,121 @@ TEMPLATES = [
     },
 ]
 
+# Разбирать все шаблоны из templates/ при запуске WSGI/ASGI-приложения,
+# чтобы первые запросы после выкладки не читали их с диска.
+TEMPLATES_WARMUP = not DEBUG
+
 WSGI_APPLICATION = 'yanews.wsgi.application'
 
 
+# Настройки SQLite для конкурентной нагрузки. WAL пускает читателей
+# параллельно с писателем, busy_timeout (мс) ждёт блокировку вместо
+# ошибки «database is locked», mmap_size и cache_size (КиБ при минусе)
+# держат горячие страницы в памяти. Выполняются на каждом новом
+# соединении, а с CONN_MAX_AGE соединение живёт между запросами.
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -64 * 1024,
+}
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'CONN_MAX_AGE': 60,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'init_command': ';'.join(
+                f'PRAGMA {name} = {value}'
+                for name, value in SQLITE_PRAGMAS.items()
+            ),
+            # Транзакция сразу берёт блокировку на запись: иначе две
+            # транзакции, начавшие с чтения, упираются друг в друга при
+            # записи, и busy_timeout уже не помогает.
+            'transaction_mode': 'IMMEDIATE',
+        },
+    },
+    # Реплика для чтения ленты и новостей. Локально это копия файла
+    # основной БД; пока её нет в DATABASE_REPLICAS, она не используется.
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'db.replica.sqlite3',
+        'CONN_MAX_AGE': 60,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'init_command': ';'.join(
+                f'PRAGMA {name} = {value}'
+                for name, value in SQLITE_PRAGMAS.items()
+            ),
+        },
+        'TEST': {'MIRROR': 'default'},
+    },
+}
+
+DATABASE_ROUTERS = ['yanews.replicas.ReplicaRouter']
+
+# Псевдонимы из DATABASES, с которых читаются лента и страницы новостей.
+DATABASE_REPLICAS = []
+
+# Сколько секунд после записи пользователь читает из основной БД.
+REPLICA_PIN_SECONDS = 10
+
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
     }
 }
 
 
+# Сессии в кеше с записью в БД (cached_db) и пользователь запроса
+# из кеша: common.authcache.CachedModelBackend.
+# Нужен общий для всех процессов кеш в CACHES: с LocMemCache проект
+# не запустится, см. common.authcache.check_shared_cache.
+AUTH_CACHE = False
+
+# Сколько секунд пользователь хранится в кеше.
+AUTH_CACHE_TIMEOUT = 60 * 60
+
+if AUTH_CACHE:
+    SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+    AUTHENTICATION_BACKENDS = ['common.authcache.CachedModelBackend']
+
+
+# Алгоритм хеширования новых паролей: 'pbkdf2', 'scrypt' или 'argon2'
+# (нужен пакет argon2-cffi). Хеши другим алгоритмом или с прежней
+# стоимостью пересчитываются при входе.
+PASSWORD_HASHING = 'pbkdf2'
+
+PASSWORD_HASHING_COST = {
+    'pbkdf2': {'iterations': 870_000},
+    'scrypt': {'work_factor': 2 ** 14, 'block_size': 8, 'parallelism': 1},
+    'argon2': {'time_cost': 2, 'memory_cost': 102_400, 'parallelism': 8},
+}
+
+PASSWORD_HASHER_CLASSES = {
+    'pbkdf2': 'common.hashers.PBKDF2PasswordHasher',
+    'scrypt': 'common.hashers.ScryptPasswordHasher',
+    'argon2': 'common.hashers.Argon2PasswordHasher',
+}
+
+PASSWORD_HASHERS = [
+    PASSWORD_HASHER_CLASSES[PASSWORD_HASHING],
+    *(
+        path for name, path in PASSWORD_HASHER_CLASSES.items()
+        if name != PASSWORD_HASHING
+    ),
+]
+
+# Вход через common.login.AsyncLoginView: под ASGI пароль проверяется
+# в пуле из PASSWORD_HASHING_THREADS потоков.
+ASYNC_LOGIN = False
+
+PASSWORD_HASHING_THREADS = 4
+
 AUTH_PASSWORD_VALIDATORS = []
 
 
@@ -80,3 +200,36 @@ LOGIN_URL = reverse_lazy('users:login')
 LOGIN_REDIRECT_URL = reverse_lazy('news:home')
 
 NEWS_COUNT_ON_HOME_PAGE = 10
+
+NEWS_SEARCH_PAGE_SIZE = 10
+
+COMMENTS_COUNT_ON_NEWS_PAGE = 50
+
+COMMENTS_CACHE_TIMEOUT = 60 * 60
+
+# Сколько последних комментариев показывать на странице новости в админке.
+COMMENTS_ADMIN_INLINE_LIMIT = 20
+
+# Отложенная запись комментариев: форма кладёт их в очередь-файл,
+# а в БД их пачками по COMMENTS_SPOOL_BATCH_SIZE переносит drain_comments.
+COMMENTS_WRITE_BEHIND = False
+
+COMMENTS_SPOOL_PATH = BASE_DIR / 'comments_spool.sqlite3'
+
+COMMENTS_SPOOL_BATCH_SIZE = 500
+
+# Асинхронные представления ленты и новости для запуска под ASGI.
+NEWS_ASYNC_VIEWS = False
+
+# Сколько запросов к БД может сделать представление, не считая загрузки
+# сессии и пользователя. Проверяется в тестах через assert_query_budget.
+QUERY_BUDGETS = {
+    'news:home': 2,
+    'news:detail': 3,
+    'news:search': 3,
+    'news:edit': 2,
+    'news:delete': 2,
+}
+
+# Файл с дополнительными запрещёнными словами, по одному на строку.
+BAD_WORDS_FILE = None
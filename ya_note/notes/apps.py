@@ -1,6 +1,13 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class NotesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'notes'
+
+    def ready(self):
+        from common import authcache  # noqa: F401
+
+        from .search import restore_triggers
+        post_migrate.connect(restore_triggers, sender=self)
@@ -0,0 +1,62 @@
+"""
+Потоковая выгрузка заметок в NDJSON и CSV.
+
+Заметки читаются через iterator() пачками по chunk_size строк и сразу
+превращаются в строки файла, поэтому память не растёт с их числом.
+Тот же формат принимает загрузка заметок.
+"""
+import csv
+import json
+
+# Поле выгрузки и путь к нему в запросе.
+FIELDS = {
+    'title': 'title',
+    'text': 'text',
+    'slug': 'slug',
+    'author': 'author__username',
+    'updated': 'updated',
+}
+CONTENT_TYPES = {
+    'ndjson': 'application/x-ndjson; charset=utf-8',
+    'csv': 'text/csv; charset=utf-8',
+}
+
+
+class Echo:
+    """Файл для csv.writer, который не копит строки, а возвращает их."""
+
+    def write(self, value):
+        return value
+
+
+def export_rows(queryset, chunk_size):
+    """Заметки как словари полей выгрузки, по порядку id."""
+    for row in queryset.order_by('id').values_list(
+            *FIELDS.values()
+    ).iterator(chunk_size=chunk_size):
+        yield dict(zip(FIELDS, row))
+
+
+def ndjson_lines(rows):
+    for row in rows:
+        row['updated'] = row['updated'].isoformat()
+        yield json.dumps(row, ensure_ascii=False) + '\n'
+
+
+def csv_lines(rows):
+    writer = csv.DictWriter(Echo(), fieldnames=list(FIELDS))
+    yield writer.writeheader()
+    for row in rows:
+        row['updated'] = row['updated'].isoformat()
+        yield writer.writerow(row)
+
+
+FORMATS = {
+    'ndjson': ndjson_lines,
+    'csv': csv_lines,
+}
+
+
+def export_notes(queryset, export_format, chunk_size):
+    """Строки файла выгрузки заметок queryset в формате export_format."""
+    return FORMATS[export_format](export_rows(queryset, chunk_size))
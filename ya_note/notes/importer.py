@@ -0,0 +1,148 @@
+"""
+Массовая загрузка заметок из NDJSON и CSV в формате выгрузки.
+
+Строки читаются потоком и вставляются через bulk_create пачками, каждая
+пачка в своей транзакции. Занятые slug загружаются из БД одним запросом
+до начала загрузки, а совпадения разрешаются в памяти: Note.save и его
+запрос на каждую заметку здесь не участвуют.
+"""
+import csv
+import json
+import time
+from collections import namedtuple
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+
+from pytils.translit import slugify
+
+from .models import SLUG_SUFFIX_LENGTH, Note
+
+FORMATS = ('ndjson', 'csv')
+
+
+class ImportStats(namedtuple('ImportStats', ('rows', 'seconds'))):
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.seconds if self.seconds else 0.0
+
+
+def read_rows(stream, import_format):
+    """Строки файла stream как словари полей заметки."""
+    if import_format == 'csv':
+        yield from csv.DictReader(stream)
+        return
+    for line in stream:
+        if line.strip():
+            yield json.loads(line)
+
+
+class SlugAllocator:
+    """
+    Выдаёт свободные slug, не обращаясь к БД.
+
+    Для каждой основы помнит последний выданный номер суффикса, поэтому
+    тысяча заметок с одинаковым заголовком не перебирает номера заново.
+    """
+
+    def __init__(self, taken):
+        self.taken = taken
+        self.max_length = Note._meta.get_field('slug').max_length
+        self.suffixes = {}
+
+    def allocate(self, base):
+        base = base[:self.max_length]
+        if base in self.taken:
+            stem = base[:self.max_length - SLUG_SUFFIX_LENGTH]
+            suffix = self.suffixes.get(stem, 1) + 1
+            while f'{stem}-{suffix}' in self.taken:
+                suffix += 1
+            self.suffixes[stem] = suffix
+            base = f'{stem}-{suffix}'
+        self.taken.add(base)
+        return base
+
+
+class NoteImporter:
+    """
+    Загружает заметки пачками по batch_size строк.
+
+    Автор берётся из поля author строки, а если его нет — default_author.
+    Если slug в строке не указан или уже занят, он подбирается по
+    заголовку (или по указанному slug) с числовым суффиксом.
+    """
+
+    def __init__(self, batch_size=1000, default_author=None):
+        self.batch_size = batch_size
+        self.default_author = default_author
+        self.authors = {}
+        self.slugs = SlugAllocator(
+            set(Note.objects.values_list('slug', flat=True).iterator())
+        )
+
+    def load_authors(self, rows):
+        usernames = {
+            row['author'] for row in rows if row.get('author')
+        } - self.authors.keys()
+        if not usernames:
+            return
+        self.authors.update(
+            (user.get_username(), user)
+            for user in get_user_model().objects.filter(
+                username__in=usernames
+            )
+        )
+        missing = usernames - self.authors.keys()
+        if missing:
+            raise ValueError(
+                f'Нет пользователей: {", ".join(sorted(missing))}.'
+            )
+
+    def build(self, row):
+        if not row.get('text'):
+            raise ValueError(f'У заметки нет текста: {row}.')
+        author = (
+            self.authors[row['author']] if row.get('author')
+            else self.default_author
+        )
+        if author is None:
+            raise ValueError(f'У заметки не указан автор: {row}.')
+        title = row.get('title') or Note._meta.get_field('title').default
+        return Note(
+            title=title,
+            text=row['text'],
+            slug=self.slugs.allocate(row.get('slug') or slugify(title)),
+            author=author,
+        )
+
+    def import_batch(self, rows):
+        self.load_authors(rows)
+        notes = [self.build(row) for row in rows]
+        with transaction.atomic():
+            Note.objects.bulk_create(notes)
+        return len(notes)
+
+    def run(self, rows, on_batch=None):
+        """
+        Загружает все строки и возвращает ImportStats.
+
+        on_batch(stats) вызывается после фиксации каждой пачки: по нему
+        можно сообщать скорость и запоминать, сколько строк уже загружено.
+        """
+        rows = iter(rows)
+        started = time.perf_counter()
+        imported = 0
+        while batch := list(islice(rows, self.batch_size)):
+            imported += self.import_batch(batch)
+            if on_batch is not None:
+                on_batch(ImportStats(
+                    imported, time.perf_counter() - started
+                ))
+        return ImportStats(imported, time.perf_counter() - started)
+
+
+def import_notes(rows, batch_size=1000, default_author=None, on_batch=None):
+    """Загружает заметки из итерируемых словарей rows."""
+    return NoteImporter(batch_size, default_author).run(rows, on_batch)
@@ -0,0 +1,75 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve, reverse
+from django.utils.http import urlencode
+
+from notes.models import Note
+
+
+def full_scans(sql):
+    """Возвращает строки плана SQLite с полным сканированием таблицы."""
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+        plan = [row[-1] for row in cursor.fetchall()]
+    return [
+        step for step in plan
+        if step.startswith('SCAN ')
+        and ' USING ' not in step
+        # Поиск по FTS5 идёт по собственному индексу виртуальной таблицы.
+        and ' VIRTUAL TABLE INDEX ' not in step
+        and step != 'SCAN CONSTANT ROW'
+    ]
+
+
+class Command(BaseCommand):
+    help = (
+        'Выполняет EXPLAIN для запросов каждой страницы заметок и '
+        'завершается ошибкой, если какой-то из них сканирует таблицу '
+        'целиком. Запускайте на заполненной большой базе.'
+    )
+
+    def get_pages(self):
+        """Страницы для проверки и пользователь, от имени которого идём."""
+        note = Note.objects.select_related('author').first()
+        if note is None:
+            raise CommandError(
+                'В базе нет заметок: сначала заполните её данными.'
+            )
+        urls = (
+            reverse('notes:list'),
+            reverse('notes:detail', args=(note.slug,)),
+            reverse('notes:edit', args=(note.slug,)),
+            reverse('notes:delete', args=(note.slug,)),
+            f'{reverse("notes:search")}?{urlencode({"q": note.title})}',
+        )
+        return urls, note.author
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('Проверка планов поддерживается только SQLite.')
+        factory = RequestFactory()
+        failed = False
+        urls, user = self.get_pages()
+        for url in urls:
+            request = factory.get(url)
+            request.user = user
+            match = resolve(request.path_info)
+            with CaptureQueriesContext(connection) as captured:
+                response = match.func(request, *match.args, **match.kwargs)
+                response.render()
+            for query in captured.captured_queries:
+                if not query['sql'].lstrip().upper().startswith('SELECT'):
+                    continue
+                scans = full_scans(query['sql'])
+                if scans:
+                    failed = True
+                    self.stderr.write(f'{url}: {"; ".join(scans)}')
+                    self.stderr.write(f'    {query["sql"]}')
+            self.stdout.write(
+                f'{url}: {len(captured.captured_queries)} запросов'
+            )
+        if failed:
+            raise CommandError('Найдены запросы с полным сканированием.')
+        self.stdout.write(self.style.SUCCESS('Полных сканирований нет.'))
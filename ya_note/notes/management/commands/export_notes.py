@@ -0,0 +1,53 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from notes.export import FORMATS, export_notes
+from notes.models import Note
+
+
+class Command(BaseCommand):
+    help = (
+        'Выгружает заметки всех пользователей или одного автора в NDJSON '
+        'или CSV. Память не зависит от числа заметок.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--format', choices=FORMATS, default='ndjson',
+            dest='export_format',
+        )
+        parser.add_argument(
+            '--author', help='Имя пользователя, чьи заметки выгрузить.'
+        )
+        parser.add_argument(
+            '--output', help='Файл для выгрузки, по умолчанию stdout.'
+        )
+        parser.add_argument(
+            '--chunk-size', type=int,
+            default=settings.NOTES_EXPORT_CHUNK_SIZE,
+        )
+
+    def handle(self, *args, **options):
+        notes = Note.objects.all()
+        if options['author']:
+            try:
+                author = get_user_model().objects.get_by_natural_key(
+                    options['author']
+                )
+            except get_user_model().DoesNotExist:
+                raise CommandError(
+                    f'Пользователь {options["author"]} не найден.'
+                )
+            notes = notes.filter(author=author)
+        lines = export_notes(
+            notes, options['export_format'], options['chunk_size']
+        )
+        if options['output']:
+            with open(
+                    options['output'], 'w', encoding='utf-8', newline=''
+            ) as output:
+                output.writelines(lines)
+        else:
+            for line in lines:
+                self.stdout.write(line, ending='')
@@ -0,0 +1,89 @@
+import sys
+from itertools import islice
+from pathlib import Path
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError
+
+from notes.importer import FORMATS, import_notes, read_rows
+
+
+class Command(BaseCommand):
+    help = (
+        'Загружает заметки из файла NDJSON или CSV в формате export_notes. '
+        'После сбоя загрузку можно продолжить с ключом --resume.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл с заметками или - для stdin.')
+        parser.add_argument(
+            '--format', choices=FORMATS, dest='import_format',
+            help='Формат файла, по умолчанию по расширению.',
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--author',
+            help='Автор для строк, в которых он не указан.',
+        )
+        parser.add_argument(
+            '--resume', action='store_true',
+            help='Пропустить строки, загруженные до сбоя.',
+        )
+
+    def get_format(self, options):
+        if options['import_format']:
+            return options['import_format']
+        return 'csv' if options['path'].endswith('.csv') else 'ndjson'
+
+    def get_author(self, username):
+        if not username:
+            return None
+        try:
+            return get_user_model().objects.get_by_natural_key(username)
+        except get_user_model().DoesNotExist:
+            raise CommandError(f'Пользователь {username} не найден.')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        # Сколько строк уже загружено, хранится рядом с файлом.
+        progress = None if path == '-' else Path(f'{path}.progress')
+        if options['resume'] and progress is None:
+            raise CommandError('Продолжить можно только загрузку из файла.')
+        skipped = 0
+        if options['resume'] and progress.exists():
+            skipped = int(progress.read_text())
+        stream = (
+            sys.stdin if path == '-'
+            else open(path, encoding='utf-8', newline='')
+        )
+
+        def on_batch(stats):
+            if progress is not None:
+                progress.write_text(str(skipped + stats.rows))
+            self.stdout.write(
+                f'Загружено {skipped + stats.rows} строк, '
+                f'{stats.rows_per_second:.0f} строк/с'
+            )
+
+        try:
+            stats = import_notes(
+                islice(read_rows(stream, self.get_format(options)),
+                       skipped, None),
+                batch_size=options['batch_size'],
+                default_author=self.get_author(options['author']),
+                on_batch=on_batch,
+            )
+        except (ValueError, DatabaseError) as error:
+            raise CommandError(
+                f'{error} Загрузку можно продолжить с ключом --resume.'
+            )
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+        if progress is not None and progress.exists():
+            progress.unlink()
+        self.stdout.write(self.style.SUCCESS(
+            f'Загружено {stats.rows} заметок за {stats.seconds:.1f} с '
+            f'({stats.rows_per_second:.0f} строк/с).'
+        ))
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from notes.search import OPTIMIZE_SQL, REBUILD_SQL
+
+
+class Command(BaseCommand):
+    help = (
+        'Заново строит поисковый индекс FTS5 по всем заметкам. Нужен после '
+        'загрузки данных в обход триггеров или восстановления из копии.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--optimize', action='store_true',
+            help='Слить сегменты индекса после перестроения.',
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('Индекс FTS5 поддерживается только SQLite.')
+        with transaction.atomic(), connection.cursor() as cursor:
+            for sql in REBUILD_SQL:
+                cursor.execute(sql)
+        if options['optimize']:
+            with connection.cursor() as cursor:
+                cursor.execute(OPTIMIZE_SQL)
+        self.stdout.write(self.style.SUCCESS('Поисковый индекс перестроен.'))
@@ -0,0 +1,66 @@
+from django.db import migrations
+
+# Значения колонок в том виде, как их индексирует FTS5: «ё» заменена на «е».
+TITLE = "replace(replace({row}.title, 'ё', 'е'), 'Ё', 'Е')"
+TEXT = "replace(replace({row}.text, 'ё', 'е'), 'Ё', 'Е')"
+
+
+def columns(row):
+    return f'{TITLE.format(row=row)}, {TEXT.format(row=row)}'
+
+
+CREATE_SQL = (
+    "CREATE VIRTUAL TABLE notes_note_fts USING fts5("
+    "title, text, content='notes_note', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER notes_note_fts_insert AFTER INSERT ON notes_note BEGIN "
+    "INSERT INTO notes_note_fts(rowid, title, text) "
+    f"VALUES (new.id, {columns('new')}); END",
+    "CREATE TRIGGER notes_note_fts_delete AFTER DELETE ON notes_note BEGIN "
+    "INSERT INTO notes_note_fts(notes_note_fts, rowid, title, text) "
+    f"VALUES ('delete', old.id, {columns('old')}); END",
+    "CREATE TRIGGER notes_note_fts_update "
+    "AFTER UPDATE OF title, text ON notes_note BEGIN "
+    "INSERT INTO notes_note_fts(notes_note_fts, rowid, title, text) "
+    f"VALUES ('delete', old.id, {columns('old')}); "
+    "INSERT INTO notes_note_fts(rowid, title, text) "
+    f"VALUES (new.id, {columns('new')}); END",
+    "INSERT INTO notes_note_fts(rowid, title, text) "
+    f"SELECT note.id, {columns('note')} FROM notes_note AS note",
+)
+DROP_SQL = (
+    'DROP TRIGGER IF EXISTS notes_note_fts_insert',
+    'DROP TRIGGER IF EXISTS notes_note_fts_delete',
+    'DROP TRIGGER IF EXISTS notes_note_fts_update',
+    'DROP TABLE IF EXISTS notes_note_fts',
+)
+
+
+def run_on_sqlite(statements):
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor != 'sqlite':
+            return
+        for sql in statements:
+            schema_editor.execute(sql)
+    return run
+
+
+class Migration(migrations.Migration):
+    """
+    Индекс FTS5 для поиска по заметкам и триггеры, которые его обновляют.
+
+    На других СУБД миграция ничего не делает, поиск идёт через icontains.
+    SQLite теряет триггеры, когда Django пересоздаёт таблицу notes_note
+    при AlterField: их возвращает notes.search.restore_triggers после
+    каждого migrate.
+    """
+
+    dependencies = [
+        ('notes', '0003_note_updated'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            run_on_sqlite(CREATE_SQL), run_on_sqlite(DROP_SQL)
+        ),
+    ]
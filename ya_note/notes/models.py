@@ -1,8 +1,63 @@
+import re
+
 from django.conf import settings
-from django.db import models
+from django.db import IntegrityError, connections, models, transaction
 
 from pytils.translit import slugify
 
+from .search import FTS_TABLE, RANK_SQL, match_expression
+
+# Место под числовой суффикс «-N» при совпадении slug.
+SLUG_SUFFIX_LENGTH = 8
+SLUG_ALLOCATION_ATTEMPTS = 5
+
+
+def pick_free_slug(base, taken, max_length):
+    """
+    Первый свободный slug: base или base с суффиксом -2, -3 и так далее.
+
+    Номер берётся на единицу больше максимального из уже занятых, поэтому
+    свободное значение находится без перебора.
+    """
+    if base not in taken:
+        return base
+    stem = base[:max_length - SLUG_SUFFIX_LENGTH]
+    pattern = re.compile(rf'{re.escape(stem)}-(\d+)')
+    numbers = (pattern.fullmatch(slug) for slug in taken)
+    suffix = max(
+        (int(number.group(1)) for number in numbers if number), default=1
+    ) + 1
+    return f'{stem}-{suffix}'
+
+
+class NoteQuerySet(models.QuerySet):
+
+    def search(self, query):
+        """
+        Заметки, подходящие под поисковый запрос, от лучших к худшим.
+
+        На SQLite ищем по индексу FTS5 и ранжируем по bm25, совпадение
+        в заголовке весит больше. На других СУБД индекса нет, и поиск
+        сводится к icontains по заголовку и тексту.
+        """
+        expression = match_expression(query)
+        if expression is None:
+            return self.none()
+        if connections[self.db].vendor != 'sqlite':
+            return self.filter(
+                models.Q(title__icontains=query)
+                | models.Q(text__icontains=query)
+            ).order_by('-id')
+        return self.extra(
+            select={'rank': RANK_SQL},
+            tables=[FTS_TABLE],
+            where=[
+                f'{FTS_TABLE}.rowid = {self.model._meta.db_table}.id',
+                f'{FTS_TABLE} MATCH %s',
+            ],
+            params=[expression],
+        ).order_by('rank', 'id')
+
 
 class Note(models.Model):
     title = models.CharField(
@@ -27,12 +82,61 @@ class Note(models.Model):
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
     )
+    updated = models.DateTimeField('Изменена', auto_now=True)
+
+    objects = NoteQuerySet.as_manager()
+
+    class Meta:
+        indexes = (
+            models.Index(fields=('author', 'id'), name='note_author_idx'),
+        )
 
     def __str__(self):
         return self.title
 
+    def taken_slugs(self, base):
+        """
+        Занятые slug, с которыми может совпасть base или base-N.
+
+        Диапазон вместо startswith, чтобы запрос шёл по уникальному
+        индексу slug на любой СУБД.
+        """
+        stem = base[:self._meta.get_field('slug').max_length
+                    - SLUG_SUFFIX_LENGTH]
+        taken = Note.objects.filter(
+            slug__gte=stem, slug__lt=stem + chr(0x10FFFF)
+        ).filter(
+            models.Q(slug=base)
+            | models.Q(slug__regex=rf'^{re.escape(stem)}-[0-9]+$')
+        )
+        if self.pk is not None:
+            taken = taken.exclude(pk=self.pk)
+        return set(taken.values_list('slug', flat=True))
+
+    def allocate_slug(self):
+        max_slug_length = self._meta.get_field('slug').max_length
+        base = slugify(self.title)[:max_slug_length]
+        return pick_free_slug(base, self.taken_slugs(base), max_slug_length)
+
     def save(self, *args, **kwargs):
-        if not self.slug:
-            max_slug_length = self._meta.get_field('slug').max_length
-            self.slug = slugify(self.title)[:max_slug_length]
-        super().save(*args, **kwargs)
+        """
+        Без slug подбираем свободный по заголовку.
+
+        Если параллельный запрос успел занять тот же slug, вставка падает
+        с IntegrityError внутри savepoint и повторяется с новым номером.
+        Другие нарушения целостности повтором не исправить: их отдаём сразу.
+        """
+        if self.slug:
+            return super().save(*args, **kwargs)
+        for attempt in range(1, SLUG_ALLOCATION_ATTEMPTS + 1):
+            self.slug = self.allocate_slug()
+            try:
+                with transaction.atomic():
+                    return super().save(*args, **kwargs)
+            except IntegrityError:
+                slug_taken = Note.objects.filter(slug=self.slug).exclude(
+                    pk=self.pk
+                ).exists()
+                self.slug = ''
+                if not slug_taken or attempt == SLUG_ALLOCATION_ATTEMPTS:
+                    raise
@@ -0,0 +1,108 @@
+"""
+Полнотекстовый поиск по заметкам на SQLite FTS5.
+
+Индекс notes_note_fts хранит только словарь: текст берётся из самой
+таблицы notes_note (external content). Синхронизацию держат триггеры
+из миграции 0004_note_fts, поэтому индекс обновляется и при
+bulk_create, и при массовом update, которые не шлют сигналов.
+Буква «ё» в индексе и в запросе заменяется на «е».
+
+SQLite теряет триггеры, когда Django пересоздаёт таблицу notes_note
+при AlterField. После каждого migrate restore_triggers возвращает
+недостающие и перестраивает индекс.
+"""
+import re
+
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+FTS_TABLE = 'notes_note_fts'
+# Вес совпадения в заголовке относительно совпадения в тексте.
+TITLE_WEIGHT = 10.0
+TEXT_WEIGHT = 1.0
+RANK_SQL = f'bm25({FTS_TABLE}, {TITLE_WEIGHT}, {TEXT_WEIGHT})'
+
+WORD = re.compile(r'\w+')
+
+
+def normalize(value):
+    return value.replace('ё', 'е').replace('Ё', 'Е')
+
+
+def match_expression(query):
+    """
+    Переводит ввод пользователя в запрос FTS5 или None, если искать нечего.
+
+    Каждое слово берётся в кавычки, поэтому операторы и спецсимволы
+    синтаксиса FTS5 из ввода не исполняются. Последнее слово ищется как
+    префикс, чтобы находить заметки по недописанному слову.
+    """
+    words = WORD.findall(normalize(query))
+    if not words:
+        return None
+    terms = [f'"{word}"' for word in words]
+    terms[-1] += '*'
+    return ' '.join(terms)
+
+
+def index_columns(prefix):
+    """Значения title и text строки prefix в том виде, как их видит FTS5."""
+    return ', '.join(
+        f"replace(replace({prefix}.{column}, 'ё', 'е'), 'Ё', 'Е')"
+        for column in ('title', 'text')
+    )
+
+
+REBUILD_SQL = (
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES('delete-all')",
+    f'INSERT INTO {FTS_TABLE}(rowid, title, text) '
+    f'SELECT note.id, {index_columns("note")} FROM notes_note AS note',
+)
+OPTIMIZE_SQL = f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES('optimize')"
+TRIGGERS = {
+    f'{FTS_TABLE}_insert': (
+        'AFTER INSERT ON notes_note BEGIN '
+        f'INSERT INTO {FTS_TABLE}(rowid, title, text) '
+        f'VALUES (new.id, {index_columns("new")}); END'
+    ),
+    f'{FTS_TABLE}_delete': (
+        'AFTER DELETE ON notes_note BEGIN '
+        f'INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, text) '
+        f"VALUES ('delete', old.id, {index_columns('old')}); END"
+    ),
+    f'{FTS_TABLE}_update': (
+        'AFTER UPDATE OF title, text ON notes_note BEGIN '
+        f'INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, text) '
+        f"VALUES ('delete', old.id, {index_columns('old')}); "
+        f'INSERT INTO {FTS_TABLE}(rowid, title, text) '
+        f'VALUES (new.id, {index_columns("new")}); END'
+    ),
+}
+
+
+def restore_triggers(using=DEFAULT_DB_ALIAS, **kwargs):
+    """
+    Создаёт недостающие триггеры индекса и перестраивает его.
+
+    Подключена к post_migrate. Без таблицы индекса (SQLite ещё не дошёл
+    до 0004_note_fts или другая СУБД) ничего не делает. Возвращает имена
+    созданных триггеров.
+    """
+    connection = connections[using]
+    if connection.vendor != 'sqlite':
+        return []
+    with transaction.atomic(using=using), connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT name FROM sqlite_master WHERE name = %s '
+            "OR (type = 'trigger' AND tbl_name = 'notes_note')",
+            [FTS_TABLE],
+        )
+        existing = {name for name, in cursor.fetchall()}
+        if FTS_TABLE not in existing:
+            return []
+        missing = [name for name in TRIGGERS if name not in existing]
+        for name in missing:
+            cursor.execute(f'CREATE TRIGGER {name} {TRIGGERS[name]}')
+        if missing:
+            for sql in REBUILD_SQL:
+                cursor.execute(sql)
+    return missing
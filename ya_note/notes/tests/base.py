@@ -18,11 +18,14 @@ URLS = {
     'NOTE_DETAIL': 'notes:detail',
     'NOTE_DELETE': 'notes:delete',
     'NOTE_SUCCESS': 'notes:success',
+    'NOTE_SEARCH': 'notes:search',
+    'NOTE_EXPORT': 'notes:export',
 }
 
 ROUTE_URLS = {
     'HOME_URLS': ('notes:home', 'users:login', 'users:signup'),
-    'AUTH_USER_URLS': ('notes:list', 'notes:success', 'notes:add'),
+    'AUTH_USER_URLS': ('notes:list', 'notes:success', 'notes:add',
+                       'notes:search', 'notes:export'),
     'AUTHOR_ONLY_URLS': ('notes:detail', 'notes:edit', 'notes:delete'),
 }
 
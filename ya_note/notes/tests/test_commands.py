@@ -0,0 +1,114 @@
+import json
+import tempfile
+from io import StringIO
+from pathlib import Path
+
+from django.core.management import CommandError, call_command
+from django.core.management.sql import emit_post_migrate_signal
+from django.db import DEFAULT_DB_ALIAS, connection
+
+from notes.models import Note
+from notes.search import FTS_TABLE, restore_triggers
+from .base import BaseTestContent, NOTE_TITLE, SLUG
+
+
+class TestCommands(BaseTestContent):
+    """Набор тестов management-команд."""
+
+    def test_query_plans_use_indexes(self):
+        """Запросы страниц заметок обходятся без полного сканирования."""
+        out = StringIO()
+        call_command('check_query_plans', stdout=out, stderr=StringIO())
+        self.assertIn('Полных сканирований нет.', out.getvalue())
+
+    def test_rebuild_notes_index(self):
+        """Перестроение возвращает в индекс заметки, внесённые в обход него."""
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES('delete-all')"
+            )
+        self.assertFalse(Note.objects.search(NOTE_TITLE).exists())
+        call_command('rebuild_notes_index', '--optimize', stdout=StringIO())
+        self.assertEqual(list(Note.objects.search(NOTE_TITLE)), [self.note])
+
+    def test_migrate_restores_index_triggers(self):
+        """После migrate потерянные триггеры индекса создаются заново."""
+        with connection.cursor() as cursor:
+            cursor.execute(f'DROP TRIGGER {FTS_TABLE}_update')
+        Note.objects.filter(pk=self.note.pk).update(title='Ёлочные игрушки')
+        self.assertFalse(Note.objects.search('елочные').exists())
+        emit_post_migrate_signal(0, False, DEFAULT_DB_ALIAS)
+        self.assertEqual(list(Note.objects.search('елочные')), [self.note])
+        Note.objects.filter(pk=self.note.pk).update(title='Шары')
+        self.assertEqual(list(Note.objects.search('шары')), [self.note])
+        self.assertEqual(restore_triggers(), [])
+
+    def test_export_notes(self):
+        """Команда выгружает заметки в файл и в stdout."""
+        Note.objects.create(
+            title='Чужая', text='Текст', author=self.other_user
+        )
+        out = StringIO()
+        call_command('export_notes', stdout=out)
+        self.assertEqual(len(out.getvalue().splitlines()), 2)
+        out = StringIO()
+        call_command(
+            'export_notes', '--format=csv', f'--author={self.author}',
+            stdout=out,
+        )
+        rows = out.getvalue().splitlines()
+        self.assertEqual(len(rows), 2)
+        self.assertIn(SLUG, rows[1])
+
+    def test_import_notes_round_trip(self):
+        """Выгрузка загружается обратно, занятые slug получают суффикс."""
+        with tempfile.TemporaryDirectory() as directory:
+            for export_format in ('ndjson', 'csv'):
+                with self.subTest(export_format=export_format):
+                    path = Path(directory, f'notes.{export_format}')
+                    call_command(
+                        'export_notes', f'--format={export_format}',
+                        f'--output={path}',
+                    )
+                    call_command('import_notes', path, stdout=StringIO())
+        # Вторая выгрузка уже содержит копию из первой: 1 + 1 + 2.
+        self.assertEqual(
+            set(Note.objects.filter(title=NOTE_TITLE).values_list(
+                'slug', flat=True
+            )),
+            {SLUG, f'{SLUG}-2', f'{SLUG}-3', f'{SLUG}-2-2'}
+        )
+
+    def test_import_notes_resume(self):
+        """После сбоя загрузка продолжается с первой незагруженной строки."""
+        rows = [
+            {'title': f'Загрузка {index}', 'text': 'Текст'}
+            for index in range(5)
+        ]
+        rows[3]['text'] = ''
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory, 'notes.ndjson')
+            path.write_text(
+                ''.join(json.dumps(row) + '\n' for row in rows),
+                encoding='utf-8',
+            )
+            options = ('--batch-size=2', f'--author={self.author}')
+            with self.assertRaises(CommandError):
+                call_command('import_notes', path, *options,
+                             stdout=StringIO())
+            self.assertEqual(
+                Note.objects.filter(title__startswith='Загрузка').count(), 2
+            )
+            rows[3]['text'] = 'Исправленный текст'
+            path.write_text(
+                ''.join(json.dumps(row) + '\n' for row in rows),
+                encoding='utf-8',
+            )
+            out = StringIO()
+            call_command('import_notes', path, '--resume', *options,
+                         stdout=out)
+            self.assertIn('Загружено 3 заметок', out.getvalue())
+            self.assertFalse(Path(f'{path}.progress').exists())
+        self.assertEqual(
+            Note.objects.filter(title__startswith='Загрузка').count(), 5
+        )
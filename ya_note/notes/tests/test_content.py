@@ -1,6 +1,24 @@
+import csv
+import json
+import tracemalloc
+from http import HTTPStatus
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import SystemCheckError
+from django.template import engines
+from django.template.loaders.filesystem import Loader
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
+from common.querybudget import assert_query_budget
+from common.warmup import warm_templates
 from notes.forms import NoteForm
+from notes.models import Note
 from .base import BaseTestContent, URLS, NOTE_TITLE, NOTE_TEXT, SLUG
 
 
@@ -25,6 +43,66 @@ class TestContent(BaseTestContent):
         object_list = response.context['object_list']
         self.assertEqual(len(object_list), 0)
 
+    def test_notes_list_loads_only_listed_fields(self):
+        """Список не загружает текст заметок."""
+        with CaptureQueriesContext(connection) as queries:
+            self.author_client.get(reverse(URLS['NOTE_LIST']))
+        self.assertFalse([
+            query for query in queries.captured_queries
+            if '"notes_note"."text"' in query['sql']
+        ])
+
+    @override_settings(NOTES_LIST_PAGE_SIZE=2)
+    def test_notes_list_keyset_pages(self):
+        """Страницы списка идут по id без пропусков и повторов."""
+        Note.objects.bulk_create(
+            Note(title=f'Заметка {index}', text=NOTE_TEXT,
+                 slug=f'note-{index}', author=self.author)
+            for index in range(4)
+        )
+        url = reverse(URLS['NOTE_LIST'])
+        pages = []
+        params = {}
+        while True:
+            response = self.author_client.get(url, params)
+            pages.append([note.id for note in response.context[
+                'object_list']])
+            if response.context['next_after'] is None:
+                break
+            params = {'after': response.context['next_after']}
+        self.assertEqual([len(page) for page in pages], [2, 2, 1])
+        self.assertEqual(
+            sum(pages, []),
+            list(Note.objects.filter(author=self.author).order_by(
+                'id'
+            ).values_list('id', flat=True)),
+        )
+        for after in ('мусор', '²', '٣', '-1'):
+            with self.subTest(after=after):
+                response = self.author_client.get(url, {'after': after})
+                self.assertEqual(
+                    response.status_code, HTTPStatus.NOT_FOUND
+                )
+        response = self.author_client.get(url, {'after': '9' * 30})
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(list(response.context['object_list']), [])
+
+    def test_notes_list_json(self):
+        """Список отдаётся компактным JSON по format=json."""
+        response = self.author_client.get(
+            reverse(URLS['NOTE_LIST']), {'format': 'json'}
+        )
+        self.assertEqual(response.json(), {
+            'notes': [
+                {'id': self.note.id, 'slug': SLUG, 'title': NOTE_TITLE},
+            ],
+            'next_after': None,
+        })
+        response = self.author_client.get(
+            reverse(URLS['NOTE_LIST']), {'format': 'xml'}
+        )
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
     def test_forms_display(self):
         """
         Проверка отображения форм на страницах
@@ -39,3 +117,197 @@ class TestContent(BaseTestContent):
                 response = self.author_client.get(url)
                 self.assertIn('form', response.context)
                 self.assertIsInstance(response.context['form'], form_class)
+
+    def test_pages_within_query_budget(self):
+        """Страницы заметок укладываются в бюджет запросов из настроек."""
+        Note.objects.bulk_create(
+            Note(title=f'Заметка {index}', text=NOTE_TEXT,
+                 slug=f'note-{index}', author=self.author)
+            for index in range(10)
+        )
+        urls = (
+            reverse('notes:home'),
+            reverse(URLS['NOTE_LIST']),
+            reverse(URLS['NOTE_ADD']),
+            reverse(URLS['NOTE_SUCCESS']),
+            reverse(URLS['NOTE_SEARCH']) + '?q=Заметка',
+            *(reverse(URLS[name], args=(SLUG,))
+              for name in ('NOTE_DETAIL', 'NOTE_EDIT', 'NOTE_DELETE')),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.author_client.get(url)
+                assert_query_budget(response)
+                self.assertIn('Server-Timing', response)
+
+    def test_search_ranked_within_author_notes(self):
+        """Поиск ищет только среди заметок автора, заголовок важнее текста."""
+        in_text = Note.objects.create(
+            title='Покупки', text='Купить ёлку', author=self.author
+        )
+        in_title = Note.objects.create(
+            title='Елка', text='Нарядить', author=self.author
+        )
+        Note.objects.create(
+            title='Елка', text='Чужая', author=self.other_user
+        )
+        response = self.author_client.get(
+            reverse(URLS['NOTE_SEARCH']), {'q': 'ёлк'}
+        )
+        self.assertEqual(
+            list(response.context['object_list']), [in_title, in_text]
+        )
+
+    def test_search_paginated(self):
+        """Результаты поиска выводятся страницами."""
+        page_size = settings.NOTES_SEARCH_PAGE_SIZE
+        Note.objects.bulk_create(
+            Note(title=f'Поиск {index}', text=NOTE_TEXT,
+                 slug=f'search-{index}', author=self.author)
+            for index in range(page_size + 1)
+        )
+        url = reverse(URLS['NOTE_SEARCH'])
+        for page, expected in ((1, page_size), (2, 1)):
+            with self.subTest(page=page):
+                response = self.author_client.get(
+                    url, {'q': 'поиск', 'page': page}
+                )
+                self.assertEqual(
+                    len(response.context['object_list']), expected
+                )
+
+    def test_search_ignores_query_syntax(self):
+        """Операторы FTS5 во вводе не ломают поиск."""
+        url = reverse(URLS['NOTE_SEARCH'])
+        for query in ('"', 'AND OR', 'title:*', '', '(('):
+            with self.subTest(query=query):
+                response = self.author_client.get(url, {'q': query})
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_export_formats(self):
+        """Выгрузка содержит только заметки автора во всех форматах."""
+        Note.objects.create(
+            title='Чужая', text=NOTE_TEXT, author=self.other_user
+        )
+        url = reverse(URLS['NOTE_EXPORT'])
+        expected = [{
+            'title': NOTE_TITLE, 'text': NOTE_TEXT, 'slug': SLUG,
+            'author': self.author.username,
+            'updated': self.note.updated.isoformat(),
+        }]
+        for export_format, parse in (
+            ('ndjson', lambda lines: [json.loads(line) for line in lines]),
+            ('csv', lambda lines: list(csv.DictReader(lines))),
+        ):
+            with self.subTest(export_format=export_format):
+                response = self.author_client.get(
+                    url, {'format': export_format}
+                )
+                self.assertTrue(response.streaming)
+                content = b''.join(response.streaming_content).decode()
+                self.assertEqual(
+                    parse(content.splitlines()), expected
+                )
+
+    def test_export_unknown_format(self):
+        """Неизвестный формат выгрузки — 404."""
+        response = self.author_client.get(
+            reverse(URLS['NOTE_EXPORT']), {'format': 'xml'}
+        )
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+    @override_settings(NOTES_EXPORT_CHUNK_SIZE=50)
+    def test_export_memory_does_not_grow(self):
+        """Пик памяти выгрузки не растёт вместе с числом заметок."""
+        url = reverse(URLS['NOTE_EXPORT'])
+        created = 0
+        peaks = []
+        for total in (200, 2000):
+            Note.objects.bulk_create(
+                Note(title=f'Заметка {index}', text=NOTE_TEXT * 20,
+                     slug=f'export-{index}', author=self.author)
+                for index in range(created, total)
+            )
+            created = total
+            response = self.author_client.get(url)
+            tracemalloc.start()
+            lines = sum(1 for _ in response.streaming_content)
+            peaks.append(tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+            self.assertEqual(lines, total + 1)
+        self.assertLess(peaks[-1], peaks[0] * 1.5)
+
+    def test_note_not_modified_until_edited(self):
+        """Неизменённая заметка отдаётся ответом 304 до первой правки."""
+        url = reverse(URLS['NOTE_DETAIL'], args=(SLUG,))
+        etag = self.author_client.get(url)['ETag']
+        response = self.author_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+        self.note.save()
+        response = self.author_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_notes_list_etag_depends_on_user(self):
+        """Чужой ETag списка заметок не даёт ответа 304."""
+        url = reverse(URLS['NOTE_LIST'])
+        etag = self.author_client.get(url)['ETag']
+        response = self.author_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+        response = self.other_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_templates_warmed_up(self):
+        """После прогрева страницы рендерятся без чтения шаблонов с диска."""
+        loader = engines['django'].engine.template_loaders[0]
+        loader.reset()
+        names = warm_templates()
+        self.assertIn('notes/list.html', names)
+        self.assertLessEqual(set(names), set(loader.get_template_cache))
+        with mock.patch.object(
+            Loader, 'get_contents', side_effect=AssertionError
+        ):
+            for name in ('NOTE_LIST', 'NOTE_ADD'):
+                with self.subTest(name=name):
+                    response = self.author_client.get(reverse(URLS[name]))
+                    self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    @override_settings(
+        SESSION_ENGINE='django.contrib.sessions.backends.cached_db',
+        AUTHENTICATION_BACKENDS=['common.authcache.CachedModelBackend'],
+    )
+    def test_cached_auth_skips_session_and_user_queries(self):
+        """С кешем сессий и пользователей остаются запросы представления."""
+        cache.clear()
+        client = Client()
+        client.force_login(self.author)
+        url = reverse(URLS['NOTE_LIST'])
+        client.get(url)
+        with self.assertNumQueries(settings.QUERY_BUDGETS['notes:list']):
+            response = client.get(url)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.author.set_password('Новый пароль 2024')
+        self.author.save()
+        response = client.get(url)
+        self.assertEqual(response.status_code, HTTPStatus.FOUND)
+
+    def test_cached_auth_requires_shared_cache(self):
+        """С кешем авторизации и LocMemCache проект не запускается."""
+        call_command('check')
+        with override_settings(
+            SESSION_ENGINE='django.contrib.sessions.backends.cached_db',
+        ):
+            with self.assertRaisesRegex(SystemCheckError, 'common.E001'):
+                call_command('check')
+            with override_settings(CACHES={'default': {
+                'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
+            }}):
+                call_command('check')
+
+    async def test_query_report_under_asgi(self):
+        """Под ASGI учёт запросов видит запросы представления."""
+        await self.async_client.aforce_login(self.author)
+        response = await self.async_client.get(reverse(URLS['NOTE_LIST']))
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertIn('Server-Timing', response)
+        self.assertEqual(response.query_report.view_name, 'notes:list')
+        self.assertGreater(response.query_report.queries, 0)
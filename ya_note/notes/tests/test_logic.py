@@ -1,12 +1,19 @@
+import threading
 from http import HTTPStatus
+from unittest import mock
 
 from django.core.exceptions import ObjectDoesNotExist
+from django.db import IntegrityError, connection
+from django.test import TransactionTestCase, override_settings
 from django.urls import reverse
 from pytils.translit import slugify
 
 from notes.forms import WARNING
-from .base import LogicTestBase, NOTE_TITLE, NOTE_TEXT, URLS, SLUG, NEW_SLUG
-from ..models import Note
+from notes.importer import import_notes
+from .base import (
+    LogicTestBase, NOTE_TITLE, NOTE_TEXT, URLS, SLUG, NEW_SLUG, User
+)
+from ..models import SLUG_ALLOCATION_ATTEMPTS, Note
 
 
 class TestNoteLogic(LogicTestBase):
@@ -70,6 +77,51 @@ class TestNoteLogic(LogicTestBase):
         expected_slug = slugify(title)
         self.assertEqual(new_note.slug, expected_slug)
 
+    def test_empty_slug_same_title(self):
+        """Одинаковые заголовки получают slug с числовым суффиксом."""
+        title = 'Одинаковый заголовок'
+        for _ in range(3):
+            self.user_client.post(
+                self.add_note_url, {'title': title, 'text': NOTE_TEXT}
+            )
+        base = slugify(title)
+        self.assertEqual(
+            set(Note.objects.filter(title=title).values_list(
+                'slug', flat=True
+            )),
+            {base, f'{base}-2', f'{base}-3'}
+        )
+
+    def test_empty_slug_race(self):
+        """Slug, занятый между проверкой и вставкой, подбирается заново."""
+        title = 'Гонка за slug'
+        Note.objects.create(title=title, text=NOTE_TEXT, author=self.user)
+        taken_slugs = Note.taken_slugs
+        calls = []
+
+        def stale_first(note, base):
+            # Первая проверка «не видит» заметку параллельного запроса.
+            calls.append(base)
+            return set() if len(calls) == 1 else taken_slugs(note, base)
+
+        note = Note(title=title, text=NOTE_TEXT, author=self.author)
+        with mock.patch.object(Note, 'taken_slugs', stale_first):
+            note.save()
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(note.slug, f'{slugify(title)}-2')
+
+    def test_other_integrity_error_not_retried(self):
+        """Ошибка не из-за slug отдаётся сразу, без подбора нового."""
+        note = Note(title='Без текста', text=None, author=self.author)
+        with mock.patch.object(
+            Note, 'allocate_slug', autospec=True,
+            side_effect=Note.allocate_slug,
+        ) as allocate_slug:
+            with self.assertRaises(IntegrityError):
+                note.save()
+        self.assertEqual(allocate_slug.call_count, 1)
+        self.assertEqual(note.slug, '')
+
     def test_author_can_edit_note(self):
         """Проверка редактирования заметки автором."""
         new_data = {
@@ -123,3 +175,121 @@ class TestNoteLogic(LogicTestBase):
         self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
         self.assertEqual(Note.objects.count(), initial_count)
         self.assertTrue(Note.objects.filter(id=self.note.id).exists())
+
+    def test_write_endpoints_query_count(self):
+        """Запись не перечитывает уже загруженные объекты."""
+        cases = (
+            # Подбор slug по заголовку: запрос занятых и вставка в savepoint.
+            (self.add_note_url, {'title': 'Ещё заметка', 'text': 'Текст'}, 6),
+            (self.add_note_url, {'title': 'Ещё заметка', 'text': 'Текст',
+                                 'slug': NEW_SLUG}, 4),
+            (self.edit_note_url, {'title': 'Новый title', 'text': 'Текст',
+                                  'slug': SLUG}, 4),
+            (self.delete_note_url, {}, 4),
+        )
+        for url, form_data, queries in cases:
+            with self.subTest(url=url, form_data=form_data):
+                with self.assertNumQueries(queries):
+                    response = self.author_client.post(url, form_data)
+                self.assertRedirects(response, reverse(URLS['NOTE_SUCCESS']),
+                                     fetch_redirect_response=False)
+
+    def test_search_index_follows_changes(self):
+        """Правка и удаление заметки сразу видны в поиске."""
+        url = reverse(URLS['NOTE_SEARCH'])
+
+        def found(query):
+            response = self.author_client.get(url, {'q': query})
+            return list(response.context['object_list'])
+
+        self.assertEqual(found(NOTE_TEXT), [self.note])
+        self.author_client.post(self.edit_note_url, {
+            'title': NOTE_TITLE, 'text': 'Переписанный текст', 'slug': SLUG
+        })
+        self.assertEqual(found('переписанный'), [self.note])
+        self.assertEqual(found('заметки'), [])
+        self.author_client.post(self.delete_note_url)
+        self.assertEqual(found('переписанный'), [])
+
+    def test_import_notes_batches(self):
+        """Загрузка резолвит slug в памяти и вставляет заметки пачками."""
+        rows = [
+            {'title': NOTE_TITLE, 'text': NOTE_TEXT, 'slug': SLUG},
+            *({'title': 'Повтор', 'text': NOTE_TEXT} for _ in range(4)),
+            {'title': 'Чужая', 'text': NOTE_TEXT,
+             'author': self.user.username},
+        ]
+        # Занятые slug, авторы и по три запроса на пачку: вставка в savepoint.
+        with self.assertNumQueries(2 + 3 * 3):
+            stats = import_notes(rows, batch_size=2,
+                                 default_author=self.author)
+        self.assertEqual(stats.rows, len(rows))
+        base = slugify('Повтор')
+        self.assertEqual(
+            set(Note.objects.filter(title='Повтор').values_list(
+                'slug', flat=True
+            )),
+            {base, f'{base}-2', f'{base}-3', f'{base}-4'}
+        )
+        self.assertTrue(Note.objects.filter(slug=f'{SLUG}-2').exists())
+        self.assertEqual(
+            Note.objects.get(title='Чужая').author, self.user
+        )
+
+    @override_settings(PASSWORD_HASHING_COST={
+        'pbkdf2': {'iterations': 1000},
+        'scrypt': {'work_factor': 2 ** 4, 'block_size': 8, 'parallelism': 1},
+        'argon2': {'time_cost': 1, 'memory_cost': 8, 'parallelism': 1},
+    })
+    def test_password_rehashed_on_login(self):
+        """При входе хеш пароля пересчитывается по текущей политике."""
+        user = User.objects.create_user('Гость', password='Пароль')
+        self.assertTrue(user.password.startswith('pbkdf2_sha256$1000$'))
+        with override_settings(PASSWORD_HASHERS=[
+            'common.hashers.ScryptPasswordHasher',
+            'common.hashers.PBKDF2PasswordHasher',
+        ]):
+            response = self.client.post(
+                reverse('users:login'),
+                {'username': 'Гость', 'password': 'Пароль'},
+            )
+        self.assertEqual(response.status_code, HTTPStatus.FOUND)
+        user.refresh_from_db()
+        self.assertTrue(user.password.startswith('scrypt$16$'))
+
+
+class TestSlugRace(TransactionTestCase):
+    """Параллельное создание заметок с одинаковым заголовком."""
+
+    def test_parallel_creates_get_distinct_slugs(self):
+        """Все параллельные заметки сохраняются, slug у каждой свой."""
+        author = User.objects.create(username='Автор гонки')
+        threads_count = SLUG_ALLOCATION_ATTEMPTS
+        barrier = threading.Barrier(threads_count)
+        slugs = []
+        errors = []
+
+        def create_note():
+            try:
+                barrier.wait()
+                slugs.append(Note.objects.create(
+                    title='Гонка за slug', text=NOTE_TEXT, author=author
+                ).slug)
+            except Exception as error:
+                errors.append(error)
+            finally:
+                connection.close()
+
+        threads = [
+            threading.Thread(target=create_note)
+            for _ in range(threads_count)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        self.assertEqual(len(set(slugs)), threads_count)
+        self.assertEqual(
+            Note.objects.filter(author=author).count(), threads_count
+        )
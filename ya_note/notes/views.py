@@ -1,11 +1,48 @@
+import hashlib
+
+from django.conf import settings
 from django.contrib.auth.mixins import LoginRequiredMixin
+from django.db.models import Count, Max
+from django.http import Http404, JsonResponse, StreamingHttpResponse
 from django.urls import reverse_lazy
+from django.utils.decorators import method_decorator
 from django.views import generic
+from django.views.decorators.http import condition
 
+from .export import CONTENT_TYPES, export_notes
 from .forms import NoteForm
 from .models import Note
 
 
+def make_etag(request, *parts):
+    """Строит ETag: заметки видны только автору, его id входит в ключ."""
+    key = ':'.join(map(str, (
+        request.user.pk, request.GET.urlencode(), *parts
+    )))
+    return hashlib.md5(key.encode()).hexdigest()
+
+
+def notes_list_etag(request, *args, **kwargs):
+    """Список меняется вместе с последней правкой или числом заметок."""
+    if not request.user.is_authenticated:
+        return None
+    state = Note.objects.filter(author=request.user).aggregate(
+        updated=Max('updated'), count=Count('id')
+    )
+    return make_etag(request, state['updated'], state['count'])
+
+
+def note_etag(request, slug, *args, **kwargs):
+    if not request.user.is_authenticated:
+        return None
+    updated = Note.objects.filter(
+        author=request.user, slug=slug
+    ).values_list('updated', flat=True).first()
+    if updated is None:
+        return None
+    return make_etag(request, slug, updated.isoformat())
+
+
 class Home(generic.TemplateView):
     """Домашняя страница."""
     template_name = 'notes/home.html'
@@ -32,9 +69,8 @@ class NoteCreate(NoteBase, generic.CreateView):
     form_class = NoteForm
 
     def form_valid(self, form):
-        new_note = form.save(commit=False)
-        new_note.author = self.request.user
-        new_note.save()
+        """Заметка сохраняется один раз — в form_valid родителя."""
+        form.instance.author = self.request.user
         return super().form_valid(form)
 
 
@@ -49,11 +85,94 @@ class NoteDelete(NoteBase, generic.DeleteView):
     template_name = 'notes/delete.html'
 
 
+@method_decorator(condition(etag_func=notes_list_etag), name='dispatch')
 class NotesList(NoteBase, generic.ListView):
-    """Список всех заметок пользователя."""
-    template_name = 'notes/list.html'
+    """
+    Список заметок пользователя по возрастанию id.
 
+    Загружаются только выводимые поля, а следующая страница выбирается
+    условием id > after вместо OFFSET. С параметром format=json список
+    отдаётся компактным JSON.
+    """
+    template_name = 'notes/list.html'
+    fields = ('id', 'slug', 'title')
 
+    def get_queryset(self):
+        """Лишняя заметка в выборке показывает, есть ли следующая страница."""
+        queryset = super().get_queryset().only(*self.fields).order_by('id')
+        after = self.request.GET.get('after')
+        if after is not None:
+            # isdigit() пропускает '²', на котором int() падает: только
+            # десятичные цифры.
+            if not (after.isascii() and after.isdecimal()):
+                raise Http404('Некорректный курсор страницы.')
+            queryset = queryset.filter(id__gt=int(after))
+        return queryset[:settings.NOTES_LIST_PAGE_SIZE + 1]
+
+    def get_context_data(self, **kwargs):
+        notes = list(self.object_list)
+        page_size = settings.NOTES_LIST_PAGE_SIZE
+        return super().get_context_data(
+            object_list=notes[:page_size],
+            next_after=notes[page_size - 1].id
+            if len(notes) > page_size else None,
+            **kwargs,
+        )
+
+    def render_to_response(self, context, **response_kwargs):
+        list_format = self.request.GET.get('format', 'html')
+        if list_format == 'html':
+            return super().render_to_response(context, **response_kwargs)
+        if list_format != 'json':
+            raise Http404(f'Неизвестный формат списка: {list_format}.')
+        return JsonResponse({
+            'notes': [
+                {field: getattr(note, field) for field in self.fields}
+                for note in context['object_list']
+            ],
+            'next_after': context['next_after'],
+        }, json_dumps_params={'ensure_ascii': False})
+
+
+@method_decorator(condition(etag_func=note_etag), name='dispatch')
 class NoteDetail(NoteBase, generic.DetailView):
     """Заметка подробно."""
     template_name = 'notes/detail.html'
+
+
+class NoteSearch(NoteBase, generic.ListView):
+    """Поиск по заметкам пользователя, от лучших совпадений к худшим."""
+    template_name = 'notes/search.html'
+    paginate_by = settings.NOTES_SEARCH_PAGE_SIZE
+
+    def get_queryset(self):
+        return super().get_queryset().search(self.request.GET.get('q', ''))
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['query'] = self.request.GET.get('q', '')
+        return context
+
+
+class NoteExport(NoteBase, generic.View):
+    """
+    Выгрузка всех заметок пользователя файлом NDJSON или CSV.
+
+    Ответ отдаётся потоком: заметки читаются из БД по мере отправки.
+    """
+
+    def get(self, request, *args, **kwargs):
+        export_format = request.GET.get('format', 'ndjson')
+        if export_format not in CONTENT_TYPES:
+            raise Http404(f'Неизвестный формат выгрузки: {export_format}.')
+        response = StreamingHttpResponse(
+            export_notes(
+                self.get_queryset(), export_format,
+                settings.NOTES_EXPORT_CHUNK_SIZE,
+            ),
+            content_type=CONTENT_TYPES[export_format],
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename="notes.{export_format}"'
+        )
+        return response
@@ -1,9 +1,14 @@
+import sys
 from pathlib import Path
 
 from django.urls import reverse_lazy
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 
+# Общий для проектов пакет common лежит в корне репозитория.
+if str(BASE_DIR.parent) not in sys.path:
+    sys.path.append(str(BASE_DIR.parent))
+
 SECRET_KEY = 'django-insecure-yipnj$#j!ajarq%k55z4kuf3x79)91h0h42o9!1ho(z=!%mt=#'
 
 DEBUG = False
@@ -27,18 +32,28 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'common.querybudget.QueryBudgetMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
 ROOT_URLCONF = 'yanote.urls'
 
+# Кешированный загрузчик читает и разбирает каждый шаблон один раз
+# за жизнь процесса; при DEBUG его кеш сбрасывает автоперезагрузка.
+TEMPLATE_LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [BASE_DIR / 'templates'],
-        'APP_DIRS': True,
         'OPTIONS': {
+            'loaders': [
+                ('django.template.loaders.cached.Loader', TEMPLATE_LOADERS),
+            ],
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
@@ -49,17 +64,94 @@ TEMPLATES = [
     },
 ]
 
+# Разбирать все шаблоны из templates/ при запуске WSGI/ASGI-приложения,
+# чтобы первые запросы после выкладки не читали их с диска.
+TEMPLATES_WARMUP = not DEBUG
+
 WSGI_APPLICATION = 'yanote.wsgi.application'
 
 
+# Настройки SQLite для конкурентной нагрузки. WAL пускает читателей
+# параллельно с писателем, busy_timeout (мс) ждёт блокировку вместо
+# ошибки «database is locked», mmap_size и cache_size (КиБ при минусе)
+# держат горячие страницы в памяти. Выполняются на каждом новом
+# соединении, а с CONN_MAX_AGE соединение живёт между запросами.
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -64 * 1024,
+}
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'CONN_MAX_AGE': 60,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'init_command': ';'.join(
+                f'PRAGMA {name} = {value}'
+                for name, value in SQLITE_PRAGMAS.items()
+            ),
+            # Транзакция сразу берёт блокировку на запись: иначе две
+            # транзакции, начавшие с чтения, упираются друг в друга при
+            # записи, и busy_timeout уже не помогает.
+            'transaction_mode': 'IMMEDIATE',
+        },
+        # Тестовая БД в файле, а не в памяти: так тесты с потоками
+        # работают с настоящими отдельными соединениями.
+        'TEST': {'NAME': BASE_DIR / 'test_db.sqlite3'},
     }
 }
 
 
+# Сессии в кеше с записью в БД (cached_db) и пользователь запроса
+# из кеша: common.authcache.CachedModelBackend.
+# Нужен общий для всех процессов кеш в CACHES: с LocMemCache проект
+# не запустится, см. common.authcache.check_shared_cache.
+AUTH_CACHE = False
+
+# Сколько секунд пользователь хранится в кеше.
+AUTH_CACHE_TIMEOUT = 60 * 60
+
+if AUTH_CACHE:
+    SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+    AUTHENTICATION_BACKENDS = ['common.authcache.CachedModelBackend']
+
+
+# Алгоритм хеширования новых паролей: 'pbkdf2', 'scrypt' или 'argon2'
+# (нужен пакет argon2-cffi). Хеши другим алгоритмом или с прежней
+# стоимостью пересчитываются при входе.
+PASSWORD_HASHING = 'pbkdf2'
+
+PASSWORD_HASHING_COST = {
+    'pbkdf2': {'iterations': 870_000},
+    'scrypt': {'work_factor': 2 ** 14, 'block_size': 8, 'parallelism': 1},
+    'argon2': {'time_cost': 2, 'memory_cost': 102_400, 'parallelism': 8},
+}
+
+PASSWORD_HASHER_CLASSES = {
+    'pbkdf2': 'common.hashers.PBKDF2PasswordHasher',
+    'scrypt': 'common.hashers.ScryptPasswordHasher',
+    'argon2': 'common.hashers.Argon2PasswordHasher',
+}
+
+PASSWORD_HASHERS = [
+    PASSWORD_HASHER_CLASSES[PASSWORD_HASHING],
+    *(
+        path for name, path in PASSWORD_HASHER_CLASSES.items()
+        if name != PASSWORD_HASHING
+    ),
+]
+
+# Вход через common.login.AsyncLoginView: под ASGI пароль проверяется
+# в пуле из PASSWORD_HASHING_THREADS потоков.
+ASYNC_LOGIN = False
+
+PASSWORD_HASHING_THREADS = 4
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.MinimumLengthValidator',
@@ -87,3 +179,24 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 LOGIN_URL = reverse_lazy('users:login')
 LOGIN_REDIRECT_URL = reverse_lazy('notes:home')
+
+NOTES_SEARCH_PAGE_SIZE = 20
+
+# Сколько заметок на странице списка; страницы идут по id.
+NOTES_LIST_PAGE_SIZE = 100
+
+# Сколько заметок выгрузка читает из БД за один запрос.
+NOTES_EXPORT_CHUNK_SIZE = 2000
+
+# Сколько запросов к БД может сделать представление, не считая загрузки
+# сессии и пользователя. Проверяется в тестах через assert_query_budget.
+QUERY_BUDGETS = {
+    'notes:home': 0,
+    'notes:list': 2,
+    'notes:add': 4,
+    'notes:edit': 3,
+    'notes:detail': 2,
+    'notes:delete': 2,
+    'notes:success': 0,
+    'notes:search': 2,
+}
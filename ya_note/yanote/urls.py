@@ -1,20 +1,24 @@
+from django.conf import settings
 from django.contrib import admin
 from django.contrib.auth import views as auth_views
 from django.contrib.auth.forms import UserCreationForm
 from django.urls import include, path
 from django.views.generic import CreateView
 
+from common.login import AsyncLoginView
+
+if settings.ASYNC_LOGIN:
+    login_view = AsyncLoginView.as_view()
+else:
+    login_view = auth_views.LoginView.as_view()
+
 urlpatterns = [
     path('', include('notes.urls')),
     path('admin/', admin.site.urls),
 ]
 
 auth_urls = ([
-    path(
-        'login/',
-        auth_views.LoginView.as_view(),
-        name='login',
-    ),
+    path('login/', login_view, name='login'),
     path(
         'logout/',
         auth_views.LogoutView.as_view(